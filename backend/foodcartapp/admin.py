@@ -1,23 +1,125 @@
-from django.conf import settings
+from functools import partial
+
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.admin.widgets import AutocompleteSelect
 from django.shortcuts import redirect, reverse
 from django.templatetags.static import static
 from django.utils.html import format_html
 from geopy.distance import great_circle
 
-from geocoordinates.utils import fetch_coordinates
+from geocoordinates.utils import get_known_coordinates
+from star_burger.paginator import EstimatedCountPaginator
 
-from .models import (Order, OrderItem, Product, ProductCategory, Restaurant,
+from .candidates import get_candidate_restaurants
+from .models import (ArchivedOrder, ArchivedOrderItem, Banner, Order,
+                     OrderItem, Product, ProductCategory, Restaurant,
                      RestaurantMenuItem)
+from .search import search_queryset
+from .thumbnails import get_thumbnail_url
+
+
+class InlineRelatedObjects:
+    """Связанные объекты всех строк инлайна, загружаются одним запросом при первом обращении."""
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+        self.inline_objects = None
+
+    def get(self, field_name):
+        if self.inline_objects is None:
+            self.inline_objects = list(self.queryset)
+        return {
+            getattr(inline_object, f'{field_name}_id'): getattr(inline_object, field_name)
+            for inline_object in self.inline_objects
+        }
+
 
+class PrefetchedAutocompleteSelect(AutocompleteSelect):
+    """
+    Подписи выбранных значений берутся из объектов, загруженных один раз
+    на весь инлайн, а не отдельным запросом для каждой строки.
+    """
+    get_prefetched_objects = None
 
-class RestaurantMenuItemInline(admin.TabularInline):
+    def optgroups(self, name, value, attr=None):
+        selected_values = {
+            str(option_value) for option_value in value
+            if str(option_value) not in self.choices.field.empty_values
+        }
+        if not selected_values or not self.get_prefetched_objects:
+            return super().optgroups(name, value, attr)
+
+        prefetched_objects = {
+            str(pk): obj for pk, obj in self.get_prefetched_objects().items()
+        }
+        if not selected_values <= prefetched_objects.keys():
+            return super().optgroups(name, value, attr)
+
+        groups = [(None, [], 0)]
+        if not self.is_required:
+            groups[0][1].append(self.create_option(name, '', '', False, 0))
+        for index, option_value in enumerate(sorted(selected_values), start=1):
+            obj = prefetched_objects[option_value]
+            option = self.create_option(
+                name,
+                obj.pk,
+                self.choices.field.label_from_instance(obj),
+                True,
+                index,
+            )
+            groups.append((None, [option], index))
+        return groups
+
+
+class PrefetchedAutocompleteInlineMixin:
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs['widget'] = PrefetchedAutocompleteSelect(
+                db_field,
+                self.admin_site,
+                using=kwargs.get('using'),
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            *self.get_autocomplete_fields(request)
+        )
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        if obj is None or obj.pk is None:
+            return formset
+
+        field_names = [
+            field_name for field_name in self.get_autocomplete_fields(request)
+            if field_name in formset.form.base_fields
+        ]
+        related_objects = InlineRelatedObjects(
+            self.model.objects
+            .filter(**{formset.fk.name: obj})
+            .select_related(*field_names)
+        )
+        for field_name in field_names:
+            widget = formset.form.base_fields[field_name].widget
+            widget = getattr(widget, 'widget', widget)
+            widget.get_prefetched_objects = partial(related_objects.get, field_name)
+        return formset
+
+
+class RestaurantMenuItemInline(PrefetchedAutocompleteInlineMixin, admin.TabularInline):
     model = RestaurantMenuItem
+    autocomplete_fields = ['restaurant', 'product']
     extra = 0
 
 
 @admin.register(Restaurant)
 class RestaurantAdmin(admin.ModelAdmin):
+    ordering = [
+        'name',
+        'id',
+    ]
     search_fields = [
         'name',
         'address',
@@ -47,9 +149,11 @@ class ProductAdmin(admin.ModelAdmin):
     list_filter = [
         'category',
     ]
+    ordering = [
+        'name',
+        'id',
+    ]
     search_fields = [
-        # FIXME SQLite can not convert letter case for cyrillic words properly, so search will be buggy.
-        # Migration to PostgreSQL is necessary
         'name',
         'category__name',
     ]
@@ -89,17 +193,22 @@ class ProductAdmin(admin.ModelAdmin):
             )
         }
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search_queryset(queryset, search_term), False
+
     def get_image_preview(self, obj):
         if not obj.image:
             return 'выберите картинку'
-        return format_html('<img src="{url}" style="max-height: 200px;"/>', url=obj.image.url)
+        return format_html('<img src="{url}" style="max-height: 200px;"/>', url=get_thumbnail_url(obj, 320))
     get_image_preview.short_description = 'превью'
 
     def get_image_list_preview(self, obj):
         if not obj.image or not obj.id:
             return 'нет картинки'
         edit_url = reverse('admin:foodcartapp_product_change', args=(obj.id,))
-        return format_html('<a href="{edit_url}"><img src="{src}" style="max-height: 50px;"/></a>', edit_url=edit_url, src=obj.image.url)
+        return format_html('<a href="{edit_url}"><img src="{src}" style="max-height: 50px;"/></a>', edit_url=edit_url, src=get_thumbnail_url(obj, 160))
     get_image_list_preview.short_description = 'превью'
 
 
@@ -108,13 +217,97 @@ class ProductCategoryAdmin(admin.ModelAdmin):
     pass
 
 
-class OrderItemInline(admin.TabularInline):
+@admin.register(Banner)
+class BannerAdmin(admin.ModelAdmin):
+    list_display = [
+        'get_image_list_preview',
+        'title',
+        'position',
+        'active_from',
+        'active_until',
+    ]
+    list_display_links = [
+        'title',
+    ]
+    list_editable = [
+        'position',
+    ]
+    search_fields = [
+        'title',
+        'text',
+    ]
+
+    def get_image_list_preview(self, obj):
+        if not obj.image:
+            return 'нет картинки'
+        return format_html('<img src="{src}" style="max-height: 50px;"/>', src=obj.image.url)
+    get_image_list_preview.short_description = 'превью'
+
+
+class OrderItemInline(PrefetchedAutocompleteInlineMixin, admin.TabularInline):
     model = OrderItem
     fields = ['product', 'quantity', 'price_at_purchase']
     readonly_fields = ['price_at_purchase']
+    autocomplete_fields = ['product']
     extra = 0
 
 
+def annotate_restaurant_distances(orders):
+    """Считает расстояния до ресторанов для всей страницы заказов за один проход."""
+    for order in orders:
+        order.distance_display = 'N/A'
+    orders = [order for order in orders if order.restaurant and order.delivery_address]
+    coordinates = get_known_coordinates(
+        addresses=[
+            address
+            for order in orders
+            for address in (order.delivery_address, order.restaurant.address)
+        ],
+        geocoded_addresses=[
+            geocoded
+            for order in orders
+            for geocoded in (order.geocoded_delivery_address, order.restaurant.geocoded_address)
+        ],
+    )
+
+    for order in orders:
+        order_coords = coordinates.get(order.delivery_address)
+        restaurant_coords = coordinates.get(order.restaurant.address)
+        if not order_coords:
+            order.distance_display = 'Ошибка адреса заказа'
+        elif not restaurant_coords:
+            order.distance_display = 'Ошибка адреса ресторана'
+        else:
+            distance = great_circle(order_coords, restaurant_coords).km
+            order.distance_display = f'{round(distance)} км'
+
+
+class OrderChangeList(ChangeList):
+    def get_queryset(self, request):
+        return super().get_queryset(request).only(
+            'id',
+            'client_name',
+            'surname',
+            'phone',
+            'delivery_address',
+            'created_at',
+            'status',
+            'payment_method',
+            'restaurant__name',
+            'restaurant__address',
+            'restaurant__geocoded_address__address',
+            'restaurant__geocoded_address__latitude',
+            'restaurant__geocoded_address__longitude',
+            'geocoded_delivery_address__address',
+            'geocoded_delivery_address__latitude',
+            'geocoded_delivery_address__longitude',
+        )
+
+    def get_results(self, request):
+        super().get_results(request)
+        annotate_restaurant_distances(self.result_list)
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = (
@@ -148,24 +341,31 @@ class OrderAdmin(admin.ModelAdmin):
         'geocoded_delivery_address',
     )
     readonly_fields = ('created_at', 'geocoded_delivery_address')
+    list_select_related = (
+        'restaurant__geocoded_address',
+        'geocoded_delivery_address',
+    )
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     inlines = [
         OrderItemInline,
     ]
 
-    def get_form(self, request, obj=None, **kwargs):
-        if obj:
-            obj = Order.objects.prefetch_available_restaurants().get(pk=obj.pk)
-        self.obj = obj
-        return super().get_form(request, obj, **kwargs)
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search_queryset(queryset, search_term), False
 
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         if db_field.name == 'restaurant':
-            if self.obj:
-                suitable_restaurants = Order.objects.get_matching_restaurants_for_order(self.obj)
-                kwargs['queryset'] = Restaurant.objects.filter(id__in=[r.id for r in suitable_restaurants])
-            else:
-                kwargs['queryset'] = Restaurant.objects.all()
+            object_id = request.resolver_match.kwargs.get('object_id')
+            if object_id and object_id.isdigit():
+                order_id = int(object_id)
+                candidates = get_candidate_restaurants(request, [order_id])[order_id]
+                kwargs['queryset'] = Restaurant.objects.filter(
+                    id__in=[restaurant.id for restaurant in candidates]
+                )
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
     def save_model(self, request, obj, form, change):
@@ -178,6 +378,8 @@ class OrderAdmin(admin.ModelAdmin):
 
     def save_formset(self, request, form, formset, change):
         instances = formset.save(commit=False)
+        for deleted_instance in formset.deleted_objects:
+            deleted_instance.delete()
         for instance in instances:
             if isinstance(instance, OrderItem) and not instance.pk and instance.product:
                 instance.price_at_purchase = instance.product.price
@@ -197,30 +399,74 @@ class OrderAdmin(admin.ModelAdmin):
             return redirect(redirect_url)
         return super().response_add(request, obj, post_url_continue)
 
+    def get_changelist(self, request, **kwargs):
+        return OrderChangeList
+
     def get_distance_display(self, obj):
-        if not obj.restaurant or not obj.delivery_address:
-            return 'N/A'
+        if not hasattr(obj, 'distance_display'):
+            annotate_restaurant_distances([obj])
+        return obj.distance_display
 
-        order_coords = fetch_coordinates(settings.YANDEX_GEOCODER_API_KEY, obj.delivery_address)
+    get_distance_display.short_description = 'Расстояние до ресторана'
 
-        if not order_coords:
-            return 'Ошибка адреса заказа'
 
-        order_lat, order_lon = float(order_coords[1]), float(order_coords[0])
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    fields = ['product', 'quantity', 'price_at_purchase']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
 
-        restaurant_coords = fetch_coordinates(settings.YANDEX_GEOCODER_API_KEY, obj.restaurant.address)
-        if not restaurant_coords:
-            return 'Ошибка адреса ресторана'
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
 
-        restaurant_lon, restaurant_lat = float(restaurant_coords[0]), float(restaurant_coords[1])
+    def has_add_permission(self, request, obj=None):
+        return False
 
-        distance = great_circle(
-            (order_lat, order_lon),
-            (restaurant_lat, restaurant_lon)
-        ).km
 
-        return f'{round(distance)} км'
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = (
+        'id',
+        'client_name',
+        'surname',
+        'phone',
+        'delivery_address',
+        'created_at',
+        'restaurant',
+        'status',
+        'total_cost',
+    )
+    list_filter = ('status',)
+    search_fields = (
+        'id',
+        'client_name',
+        'surname',
+        'phone',
+        'delivery_address',
+        'items__product__name',
+        'restaurant__name',
+    )
+    list_select_related = ('restaurant',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    inlines = [
+        ArchivedOrderItemInline,
+    ]
 
-    get_distance_display.short_description = 'Расстояние до ресторана'
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search_queryset(queryset, search_term), False
+
+    def get_readonly_fields(self, request, obj=None):
+        return [field.name for field in self.model._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
 
+    def has_change_permission(self, request, obj=None):
+        return False
 
+    def has_delete_permission(self, request, obj=None):
+        return False
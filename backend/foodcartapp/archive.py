@@ -0,0 +1,74 @@
+from django.db import transaction
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+from .search import index_search_documents
+
+ARCHIVED_ORDER_FIELDS = [
+    'id',
+    'created_at',
+    'called_at',
+    'delivered_at',
+    'client_name',
+    'surname',
+    'phone',
+    'delivery_address',
+    'status',
+    'payment_method',
+    'customer_comment',
+    'restaurant_id',
+    'total_cost',
+    'search_document',
+]
+
+ARCHIVED_ORDER_ITEM_FIELDS = [
+    'order_id',
+    'product_id',
+    'quantity',
+    'price_at_purchase',
+]
+
+
+def archive_order_batch(order_ids, created_before):
+    """Переносит заказы в архив одной транзакцией. Заказы, которые успели измениться, пропускаются."""
+    with transaction.atomic():
+        orders = list(
+            Order.objects
+            .archivable(created_before)
+            .filter(id__in=order_ids)
+            .select_for_update()
+        )
+        archived_ids = [order.id for order in orders]
+        if not archived_ids:
+            return 0
+
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(**{field: getattr(order, field) for field in ARCHIVED_ORDER_FIELDS})
+            for order in orders
+        ])
+        ArchivedOrderItem.objects.bulk_create([
+            ArchivedOrderItem(**{field: getattr(item, field) for field in ARCHIVED_ORDER_ITEM_FIELDS})
+            for item in OrderItem.objects.filter(order_id__in=archived_ids)
+        ])
+        index_search_documents(ArchivedOrder, {order.id: order.search_document for order in orders})
+        Order.objects.filter(id__in=archived_ids).delete()
+    return len(archived_ids)
+
+
+def archive_orders(created_before, batch_size):
+    """
+    Переносит выполненные и отменённые заказы, созданные раньше created_before,
+    в архивные таблицы пачками по batch_size. Отдаёт количество перенесённых в каждой пачке.
+    """
+    last_id = 0
+    while True:
+        order_ids = list(
+            Order.objects
+            .archivable(created_before)
+            .filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not order_ids:
+            return
+        last_id = order_ids[-1]
+        yield archive_order_batch(order_ids, created_before)
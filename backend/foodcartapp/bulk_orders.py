@@ -0,0 +1,111 @@
+import json
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .models import Order, OrderItem, Product
+from .payloads import dump_json
+from .search import update_order_search_documents
+from .serializers import OrderSerializer
+
+
+def read_batches(lines, batch_size):
+    batch = []
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        batch.append((line_number, line))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def get_product_ids(order_payload):
+    if not isinstance(order_payload, dict) or not isinstance(order_payload.get('products'), list):
+        return set()
+    return {
+        item['product'] for item in order_payload['products']
+        if isinstance(item, dict) and isinstance(item.get('product'), int)
+    }
+
+
+def save_orders(validated_orders):
+    """Сохраняет заказы пачкой, без геокодирования адресов."""
+    with transaction.atomic():
+        orders = Order.objects.bulk_create([
+            Order(
+                **{
+                    field: value for field, value in order_data.items()
+                    if field != 'products'
+                },
+                total_cost=sum(
+                    item['product'].price * item['quantity']
+                    for item in order_data['products']
+                ),
+            )
+            for order_data in validated_orders
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=item['product'],
+                quantity=item['quantity'],
+                price_at_purchase=item['product'].price,
+            )
+            for order, order_data in zip(orders, validated_orders)
+            for item in order_data['products']
+        ])
+        update_order_search_documents([order.id for order in orders])
+    return orders
+
+
+def import_orders(lines, batch_size):
+    """
+    Принимает строки NDJSON с заказами в формате POST /api/order/ и
+    для каждой строки отдаёт строку NDJSON с результатом.
+    """
+    products = {}
+    for batch in read_batches(lines, batch_size):
+        results = {}
+        order_payloads = {}
+        for line_number, line in batch:
+            try:
+                order_payloads[line_number] = json.loads(line)
+            except ValueError:
+                results[line_number] = {
+                    'line': line_number,
+                    'status': 'error',
+                    'errors': {'non_field_errors': ['Некорректный JSON']},
+                }
+
+        product_ids = set().union(*map(get_product_ids, order_payloads.values()))
+        unknown_product_ids = product_ids - products.keys()
+        if unknown_product_ids:
+            products.update(Product.objects.available().in_bulk(unknown_product_ids))
+
+        # Один экземпляр сериализатора, чтобы не собирать поля заново для каждой строки
+        serializer = OrderSerializer(context={'products': products})
+        validated_orders = {}
+        for line_number, order_payload in order_payloads.items():
+            try:
+                validated_orders[line_number] = serializer.run_validation(order_payload)
+            except ValidationError as error:
+                results[line_number] = {
+                    'line': line_number,
+                    'status': 'error',
+                    'errors': error.detail,
+                }
+
+        if validated_orders:
+            orders = save_orders(list(validated_orders.values()))
+            for line_number, order in zip(validated_orders, orders):
+                results[line_number] = {
+                    'line': line_number,
+                    'status': 'created',
+                    'id': order.id,
+                }
+
+        for line_number, _ in batch:
+            yield dump_json(results[line_number]) + b'\n'
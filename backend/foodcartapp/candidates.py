@@ -0,0 +1,122 @@
+import copy
+from collections import defaultdict
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from geopy.distance import great_circle
+
+from geocoordinates.utils import get_known_coordinates
+from star_burger.metrics import record_cache_lookup
+
+from .models import Order, OrderItem, RestaurantMenuItem
+from .versions import get_order_version_name, get_versions
+
+
+def get_candidates_cache_key(order_id, order_version, menu_version, restaurants_version):
+    return f'candidate_restaurants:{order_id}:{order_version}:{menu_version}:{restaurants_version}'
+
+
+def find_candidate_restaurants(orders):
+    """
+    Рестораны, которые могут приготовить весь заказ, отсортированные по расстоянию.
+    Координаты берутся только из сохранённых геокодов, геокодер не вызывается.
+    """
+    candidates = {order.id: [] for order in orders}
+    orders = [order for order in orders if order.delivery_address]
+    if not orders:
+        return candidates
+
+    product_ids_by_order = defaultdict(set)
+    order_items = OrderItem.objects.filter(order__in=orders).values_list('order_id', 'product_id')
+    for order_id, product_id in order_items:
+        product_ids_by_order[order_id].add(product_id)
+
+    restaurants = {}
+    restaurant_ids_by_product = defaultdict(set)
+    menu_items = (
+        RestaurantMenuItem.objects
+        .filter(
+            availability=True,
+            product_id__in=set().union(*product_ids_by_order.values()),
+        )
+        .select_related('restaurant__geocoded_address')
+    )
+    for menu_item in menu_items:
+        restaurants[menu_item.restaurant_id] = menu_item.restaurant
+        restaurant_ids_by_product[menu_item.product_id].add(menu_item.restaurant_id)
+
+    coordinates = get_known_coordinates(
+        addresses=[
+            *[order.delivery_address for order in orders],
+            *[restaurant.address for restaurant in restaurants.values()],
+        ],
+        geocoded_addresses=[restaurant.geocoded_address for restaurant in restaurants.values()],
+    )
+
+    for order in orders:
+        product_ids = product_ids_by_order.get(order.id)
+        delivery_coords = coordinates.get(order.delivery_address)
+        if not product_ids or not delivery_coords:
+            continue
+
+        restaurant_ids = set.intersection(
+            *[restaurant_ids_by_product[product_id] for product_id in product_ids]
+        )
+        order_candidates = []
+        for restaurant_id in restaurant_ids:
+            restaurant_coords = coordinates.get(restaurants[restaurant_id].address)
+            if not restaurant_coords:
+                continue
+            restaurant = copy.copy(restaurants[restaurant_id])
+            restaurant.distance = round(great_circle(delivery_coords, restaurant_coords).km)
+            order_candidates.append(restaurant)
+        candidates[order.id] = sorted(order_candidates, key=attrgetter('distance'))
+    return candidates
+
+
+def get_candidate_restaurants(request, order_ids):
+    """
+    Возвращает {id заказа: подходящие рестораны}. Кандидаты запоминаются на время
+    запроса и в общем кэше по версиям заказа, меню и ресторанов, заново
+    считаются только для заказов, которых нет ни там, ни там.
+    """
+    request_candidates = request.__dict__.setdefault('candidate_restaurants', {})
+    missing_order_ids = [order_id for order_id in order_ids if order_id not in request_candidates]
+    if missing_order_ids:
+        versions = get_versions(
+            'menu',
+            'restaurants',
+            *[get_order_version_name(order_id) for order_id in missing_order_ids],
+        )
+        cache_keys = {
+            order_id: get_candidates_cache_key(
+                order_id,
+                versions[get_order_version_name(order_id)],
+                versions['menu'],
+                versions['restaurants'],
+            )
+            for order_id in missing_order_ids
+        }
+        cached_candidates = cache.get_many(cache_keys.values())
+        record_cache_lookup(len(cache_keys), len(cached_candidates))
+
+        changed_order_ids = []
+        for order_id, cache_key in cache_keys.items():
+            if cache_key in cached_candidates:
+                request_candidates[order_id] = cached_candidates[cache_key]
+            else:
+                changed_order_ids.append(order_id)
+
+        if changed_order_ids:
+            changed_orders = Order.objects.filter(id__in=changed_order_ids).only('id', 'delivery_address')
+            found_candidates = find_candidate_restaurants(list(changed_orders))
+            for order_id in changed_order_ids:
+                found_candidates.setdefault(order_id, [])
+            cache.set_many(
+                {cache_keys[order_id]: candidates for order_id, candidates in found_candidates.items()},
+                timeout=settings.CANDIDATE_RESTAURANTS_CACHE_TIMEOUT,
+            )
+            request_candidates.update(found_candidates)
+
+    return {order_id: request_candidates[order_id] for order_id in order_ids}
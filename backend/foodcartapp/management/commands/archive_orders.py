@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from foodcartapp.archive import archive_orders
+
+
+class Command(BaseCommand):
+    help = 'Переносит старые выполненные и отменённые заказы в архивные таблицы'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+            help='Архивировать заказы старше этого количества дней',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько заказов переносить за одну транзакцию',
+        )
+
+    def handle(self, *args, **options):
+        created_before = timezone.now() - timedelta(days=options['days'])
+        archived_count = 0
+        for batch_count in archive_orders(created_before, options['batch_size']):
+            archived_count += batch_count
+            self.stdout.write(f'Перенесено заказов: {archived_count}')
+        self.stdout.write(f'Готово, всего перенесено: {archived_count}')
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+
+from foodcartapp.models import Order
+from foodcartapp.versions import bump_version, get_order_version_name
+
+
+class Command(BaseCommand):
+    help = 'Сверяет сохранённую стоимость заказов с суммой их позиций'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Пересчитать стоимость заказов, у которых она не сходится',
+        )
+
+    def handle(self, *args, **options):
+        mismatched_orders = (
+            Order.objects
+            .annotate_with_total_cost()
+            .exclude(total_cost=F('total_order_cost'))
+            .values_list('id', 'total_cost', 'total_order_cost')
+        )
+        mismatched_ids = []
+        for order_id, total_cost, total_order_cost in mismatched_orders.iterator():
+            mismatched_ids.append(order_id)
+            self.stdout.write(f'Заказ {order_id}: сохранено {total_cost}, по позициям {total_order_cost}')
+
+        if not mismatched_ids:
+            self.stdout.write('Расхождений нет')
+            return
+
+        if not options['fix']:
+            raise CommandError(f'Расхождений: {len(mismatched_ids)}. Запустите с --fix, чтобы пересчитать.')
+
+        updated_count = Order.objects.filter(id__in=mismatched_ids).update_total_cost()
+        bump_version(*[get_order_version_name(order_id) for order_id in mismatched_ids])
+        self.stdout.write(f'Пересчитано заказов: {updated_count}')
@@ -0,0 +1,104 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from foodcartapp.models import Order, OrderItem, Product, RestaurantMenuItem
+
+
+def get_checked_querysets():
+    """Запросы, которые менеджерские страницы и API выполняют чаще всего."""
+    active_statuses = [Order.STATUS_NEW, Order.STATUS_PREPARING]
+    product_ids = list(Product.objects.order_by('id').values_list('id', flat=True)[:10]) or [0]
+    order_ids = list(Order.objects.order_by('id').values_list('id', flat=True)[:10]) or [0]
+    return {
+        'активные заказы для дашборда': (
+            Order.objects
+            .filter(status__in=active_statuses)
+            .order_by('created_at')
+            .values_list('id', flat=True)
+        ),
+        'annotate_with_total_cost': (
+            Order.objects
+            .filter(status__in=active_statuses)
+            .annotate_with_total_cost()
+        ),
+        'Product.objects.available()': Product.objects.available(),
+        'prefetch_available_menu_items': (
+            RestaurantMenuItem.objects
+            .filter(availability=True, product__in=product_ids)
+            .select_related('restaurant')
+        ),
+        'позиции заказов для подбора ресторанов': (
+            OrderItem.objects
+            .filter(order_id__in=order_ids)
+            .values_list('order_id', 'product_id')
+        ),
+        'доступные рестораны для подбора': (
+            RestaurantMenuItem.objects
+            .filter(availability=True, product_id__in=product_ids)
+            .select_related('restaurant__geocoded_address')
+        ),
+        'заказы для архивации': (
+            Order.objects
+            .archivable(timezone.now() - timedelta(days=90))
+            .order_by('id')
+            .values_list('id', flat=True)[:500]
+        ),
+    }
+
+
+def find_sqlite_seq_scans(plan):
+    seq_scans = []
+    for line in plan.splitlines():
+        detail = line.split(' ', 3)[-1]
+        if not detail.startswith('SCAN ') or ' USING ' in detail:
+            continue
+        table = detail.split()[1]
+        if table.startswith('(') or table == 'CONSTANT':
+            continue
+        seq_scans.append(table)
+    return seq_scans
+
+
+def find_postgresql_seq_scans(plan):
+    seq_scans = []
+    nodes = [json.loads(plan)[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if node['Node Type'] == 'Seq Scan':
+            seq_scans.append(node['Relation Name'])
+        nodes.extend(node.get('Plans', []))
+    return seq_scans
+
+
+class Command(BaseCommand):
+    help = 'Проверяет через EXPLAIN, что ключевые запросы не читают таблицы целиком'
+
+    def explain(self, queryset):
+        if connection.vendor == 'postgresql':
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+                plan = queryset.explain(format='json')
+            return plan, find_postgresql_seq_scans(plan)
+        if connection.vendor == 'sqlite':
+            plan = queryset.explain()
+            return plan, find_sqlite_seq_scans(plan)
+        raise CommandError(f'Проверка планов не поддерживается для {connection.vendor}')
+
+    def handle(self, *args, **options):
+        failed_names = []
+        for name, queryset in get_checked_querysets().items():
+            plan, seq_scans = self.explain(queryset)
+            self.stdout.write(f'== {name}')
+            self.stdout.write(plan)
+            if seq_scans:
+                failed_names.append(name)
+                self.stderr.write(f'Полный просмотр таблиц: {", ".join(seq_scans)}')
+
+        if failed_names:
+            raise CommandError(f'Запросы без индекса: {", ".join(failed_names)}')
+        self.stdout.write('Все запросы используют индексы')
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import Product
+from foodcartapp.thumbnails import generate_image_variants, has_fresh_variants
+
+
+class Command(BaseCommand):
+    help = 'Нарезает уменьшенные JPEG и WebP варианты картинок продуктов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать варианты даже для картинок, которые уже нарезаны',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Сколько картинок отправлять в пул процессов за раз',
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').only('id', 'image', 'image_variants').order_by('id')
+        batch = []
+        updated_count = 0
+        for product in products.iterator():
+            if not options['force'] and has_fresh_variants(product):
+                continue
+            batch.append(product)
+            if len(batch) >= options['batch_size']:
+                updated_count += generate_image_variants(batch)
+                batch = []
+        if batch:
+            updated_count += generate_image_variants(batch)
+        self.stdout.write(f'Обновлено продуктов: {updated_count}')
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import Order
+from foodcartapp.versions import bump_version, get_order_version_name
+from geocoordinates.utils import get_or_create_geocoded_address
+
+
+class Command(BaseCommand):
+    help = 'Геокодирует адреса заказов, загруженных без геокодирования'
+
+    def handle(self, *args, **options):
+        addresses = (
+            Order.objects
+            .filter(geocoded_delivery_address__isnull=True)
+            .order_by()
+            .values_list('delivery_address', flat=True)
+            .distinct()
+        )
+        for address in addresses.iterator():
+            geocoded_address = get_or_create_geocoded_address(address)
+            order_ids = list(
+                Order.objects
+                .filter(delivery_address=address, geocoded_delivery_address__isnull=True)
+                .values_list('id', flat=True)
+            )
+            Order.objects.filter(id__in=order_ids).update(geocoded_delivery_address=geocoded_address)
+            bump_version(*[get_order_version_name(order_id) for order_id in order_ids])
+            self.stdout.write(f'{address}: {len(order_ids)}')
@@ -0,0 +1,36 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import Banner, Product
+from foodcartapp.thumbnails import generate_image_variants
+from foodcartapp.versions import bump_version
+
+
+class Command(BaseCommand):
+    help = 'Переименовывает загруженные ранее картинки по хэшу содержимого'
+
+    def rename_images(self, model):
+        renamed_ids = []
+        objects = model.objects.exclude(image='').only('id', 'image').order_by('id')
+        for obj in objects.iterator():
+            if default_storage.is_content_name(obj.image.name):
+                continue
+            try:
+                with default_storage.open(obj.image.name, 'rb') as image_file:
+                    content_name = default_storage.save(obj.image.name, image_file)
+            except OSError:
+                self.stderr.write(f'{model.__name__} {obj.id}: не удалось прочитать {obj.image.name}')
+                continue
+            model.objects.filter(pk=obj.pk, image=obj.image.name).update(image=content_name)
+            renamed_ids.append(obj.pk)
+            self.stdout.write(f'{obj.image.name} -> {content_name}')
+        return renamed_ids
+
+    def handle(self, *args, **options):
+        product_ids = self.rename_images(Product)
+        banner_ids = self.rename_images(Banner)
+
+        if product_ids:
+            generate_image_variants(Product.objects.filter(id__in=product_ids))
+        bump_version('catalog', 'banners')
+        self.stdout.write(f'Продуктов: {len(product_ids)}, баннеров: {len(banner_ids)}')
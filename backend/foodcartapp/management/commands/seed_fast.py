@@ -0,0 +1,209 @@
+import json
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.core.serializers.python import Deserializer
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+
+from foodcartapp.models import Order, Product, Restaurant
+from foodcartapp.search import (update_order_search_documents,
+                                update_product_search_documents)
+from foodcartapp.versions import bump_version
+from geocoordinates.models import GeocodedAddress
+from geocoordinates.utils import get_or_create_geocoded_address
+
+READ_CHUNK_SIZE = 64 * 1024
+
+GEOCODED_MODELS = [
+    (Order, 'delivery_address', 'geocoded_delivery_address'),
+    (Restaurant, 'address', 'geocoded_address'),
+]
+
+
+def iter_json_array(fixture_file):
+    """Читает объекты из JSON-массива по одному, не загружая весь файл в память."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    array_started = False
+    while True:
+        chunk = fixture_file.read(READ_CHUNK_SIZE)
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not array_started and position < len(buffer):
+                if buffer[position] != '[':
+                    raise CommandError('Ожидается JSON-массив в формате dumpdata')
+                array_started = True
+                position += 1
+                continue
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                obj, position = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if not chunk:
+                    raise CommandError('Файл оборвался посреди объекта')
+                break
+            yield obj
+        if not chunk:
+            return
+
+
+def iter_fixture(fixture_file, fixture_path):
+    if fixture_path.endswith('.jsonl'):
+        for line in fixture_file:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        yield from iter_json_array(fixture_file)
+
+
+@contextmanager
+def keep_auto_dates():
+    """bulk_create проставил бы auto_now/auto_now_add текущее время вместо дат из дампа."""
+    auto_fields = [
+        (field, field.auto_now, field.auto_now_add)
+        for model in apps.get_models()
+        for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    for field, _, _ in auto_fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in auto_fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        'Быстро загружает дамп dumpdata (JSON или JSONL) пачками bulk_create, '
+        'без геокодирования и сигналов на каждую строку'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('fixture', help='Путь к файлу, сохранённому dumpdata')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Сколько объектов одной модели вставлять за раз',
+        )
+        parser.add_argument(
+            '--no-geocode',
+            action='store_true',
+            help='Не обращаться к геокодеру, только привязать уже известные адреса',
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.buffers = defaultdict(list)
+        self.field_names = defaultdict(set)
+        self.loaded_pks = defaultdict(list)
+        self.m2m_data = []
+
+        with open(options['fixture'], encoding='utf-8') as fixture_file:
+            objects = iter_fixture(fixture_file, options['fixture'])
+            with keep_auto_dates(), transaction.atomic():
+                with connection.constraint_checks_disabled():
+                    for deserialized in Deserializer(self.track_fields(objects)):
+                        self.add(deserialized)
+                    self.flush_all()
+                    self.save_m2m()
+                connection.check_constraints(
+                    table_names=[model._meta.db_table for model in self.loaded_pks]
+                )
+                self.reset_sequences()
+
+        for model, pks in self.loaded_pks.items():
+            self.stdout.write(f'{model._meta.label}: {len(pks)}')
+
+        self.link_geocoded_addresses()
+        if not options['no_geocode']:
+            self.geocode_missing_addresses()
+            self.link_geocoded_addresses()
+
+        order_ids = self.loaded_pks[Order]
+        for start in range(0, len(order_ids), self.batch_size):
+            Order.objects.filter(id__in=order_ids[start:start + self.batch_size]).update_total_cost()
+        update_order_search_documents(self.loaded_pks[Order])
+        update_product_search_documents(self.loaded_pks[Product])
+        bump_version('catalog', 'menu', 'restaurants', 'banners')
+        if self.loaded_pks[Product]:
+            self.stdout.write('Варианты картинок не нарезаны, запустите generate_image_variants')
+
+    def track_fields(self, objects):
+        for obj in objects:
+            self.field_names[obj['model'].lower()].update(obj.get('fields', {}))
+            yield obj
+
+    def add(self, deserialized):
+        obj = deserialized.object
+        buffer = self.buffers[type(obj)]
+        buffer.append(obj)
+        if deserialized.m2m_data:
+            self.m2m_data.append((obj, deserialized.m2m_data))
+        if len(buffer) >= self.batch_size:
+            self.flush(type(obj))
+
+    def flush(self, model):
+        objects = self.buffers.pop(model, [])
+        if not objects:
+            return
+        update_fields = [
+            field.name for field in model._meta.concrete_fields
+            if field.name in self.field_names[model._meta.label_lower] and not field.primary_key
+        ]
+        model._base_manager.bulk_create(
+            objects,
+            update_conflicts=bool(update_fields),
+            ignore_conflicts=not update_fields,
+            unique_fields=[model._meta.pk.name] if update_fields else None,
+            update_fields=update_fields or None,
+        )
+        self.loaded_pks[model].extend(obj.pk for obj in objects)
+
+    def flush_all(self):
+        for model in list(self.buffers):
+            self.flush(model)
+
+    def save_m2m(self):
+        for obj, m2m_data in self.m2m_data:
+            for field_name, values in m2m_data.items():
+                getattr(obj, field_name).set(values)
+
+    def reset_sequences(self):
+        sequence_sql = connection.ops.sequence_reset_sql(no_style(), list(self.loaded_pks))
+        if sequence_sql:
+            with connection.cursor() as cursor:
+                for sql in sequence_sql:
+                    cursor.execute(sql)
+
+    def link_geocoded_addresses(self):
+        for model, address_field, geocoded_field in GEOCODED_MODELS:
+            geocoded_ids = GeocodedAddress.objects.filter(address=OuterRef(address_field)).values('id')[:1]
+            model.objects.filter(**{f'{geocoded_field}__isnull': True}).update(
+                **{geocoded_field: Subquery(geocoded_ids)}
+            )
+
+    def geocode_missing_addresses(self):
+        addresses = set()
+        for model, address_field, geocoded_field in GEOCODED_MODELS:
+            addresses.update(
+                model.objects
+                .filter(**{f'{geocoded_field}__isnull': True})
+                .exclude(**{address_field: ''})
+                .values_list(address_field, flat=True)
+                .distinct()
+            )
+        for address in sorted(addresses):
+            get_or_create_geocoded_address(address)
+        self.stdout.write(f'Геокодировано новых адресов: {len(addresses)}')
@@ -1,6 +1,9 @@
 # Generated by Django 4.2.22 on 2025-06-13 22:19
 
 from django.db import migrations
+from django.db.models import Q
+
+from star_burger.backfill import backfill
 
 
 def fill_price_at_purchase(apps, schema_editor):
@@ -9,17 +12,24 @@ def fill_price_at_purchase(apps, schema_editor):
     используя текущую цену соответствующего продукта.
     """
     OrderItem = apps.get_model('foodcartapp', 'OrderItem')
-    Product = apps.get_model('foodcartapp', 'Product')
-
-    for order_item in OrderItem.objects.select_related('product').iterator():
-
-        if order_item.price_at_purchase == 0 or order_item.price_at_purchase is None:
 
+    def set_current_price(order_items):
+        for order_item in order_items:
             order_item.price_at_purchase = order_item.product.price
-            order_item.save(update_fields=['price_at_purchase'])
+        return order_items
+
+    backfill(
+        OrderItem.objects
+        .using(schema_editor.connection.alias)
+        .filter(Q(price_at_purchase=0) | Q(price_at_purchase__isnull=True))
+        .select_related('product'),
+        set_current_price,
+        fields=['price_at_purchase'],
+    )
 
 
 class Migration(migrations.Migration):
+    atomic = False
 
     dependencies = [
         ('foodcartapp', '0040_orderitem_price_at_purchase_and_more'),
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.22 on 2026-10-19 16:12
+
+from django.contrib.staticfiles import finders
+from django.core.files import File
+from django.db import migrations
+
+DEFAULT_BANNERS = [
+    ('Burger', 'burger.jpg', 'Tasty Burger at your door step'),
+    ('Spices', 'food.jpg', 'All Cuisines'),
+    ('New York', 'tasty.jpg', 'Food is incomplete without a tasty dessert'),
+]
+
+
+def add_default_banners(apps, schema_editor):
+    """
+    Переносит в базу баннеры, которые раньше были зашиты в banners_list_api.
+    Картинки копируются из статики в медиа.
+    """
+    Banner = apps.get_model('foodcartapp', 'Banner')
+
+    for position, (title, image_name, text) in enumerate(DEFAULT_BANNERS):
+        image_path = finders.find(image_name)
+        if not image_path:
+            continue
+
+        banner = Banner(title=title, text=text, position=position)
+        with open(image_path, 'rb') as image_file:
+            banner.image.save(image_name, File(image_file), save=False)
+        banner.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0051_banner'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_default_banners, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.22 on 2026-10-19 16:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0053_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='search_document',
+            field=models.TextField(blank=True, editable=False, verbose_name='Поисковый текст'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='search_document',
+            field=models.TextField(blank=True, editable=False, verbose_name='поисковый текст'),
+        ),
+    ]
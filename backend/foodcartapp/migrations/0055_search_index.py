@@ -0,0 +1,95 @@
+# Generated by Django 4.2.22 on 2026-10-19 16:18
+
+import sqlite3
+
+from django.db import migrations
+
+SEARCH_BATCH_SIZE = 1000
+
+SEARCH_TABLES = ['foodcartapp_order', 'foodcartapp_product']
+
+
+def normalize_search_text(*parts):
+    text = ' '.join(str(part) for part in parts if part)
+    return ' '.join(text.split()).casefold()
+
+
+def build_order_search_document(order):
+    return normalize_search_text(
+        order.id,
+        order.client_name,
+        order.surname,
+        order.phone,
+        order.delivery_address,
+        order.restaurant.name if order.restaurant else '',
+        *[item.product.name for item in order.items.all()],
+    )
+
+
+def build_product_search_document(product):
+    return normalize_search_text(
+        product.name,
+        product.category.name if product.category else '',
+    )
+
+
+def fill_search_documents(apps, schema_editor):
+    """Собирает search_document для уже существующих заказов и товаров."""
+    Order = apps.get_model('foodcartapp', 'Order')
+    Product = apps.get_model('foodcartapp', 'Product')
+
+    querysets = [
+        (Order.objects.select_related('restaurant').prefetch_related('items__product'), build_order_search_document),
+        (Product.objects.select_related('category'), build_product_search_document),
+    ]
+    for queryset, build_document in querysets:
+        objects = []
+        for obj in queryset.iterator(chunk_size=SEARCH_BATCH_SIZE):
+            obj.search_document = build_document(obj)
+            objects.append(obj)
+            if len(objects) >= SEARCH_BATCH_SIZE:
+                queryset.model.objects.bulk_update(objects, ['search_document'])
+                objects = []
+        queryset.model.objects.bulk_update(objects, ['search_document'])
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table in SEARCH_TABLES:
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS {table}_search_trgm '
+                f'ON {table} USING gin (search_document gin_trgm_ops)'
+            )
+    elif vendor == 'sqlite' and sqlite3.sqlite_version_info >= (3, 34):
+        for table in SEARCH_TABLES:
+            schema_editor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {table}_search '
+                f"USING fts5(search_document, tokenize='trigram')"
+            )
+            schema_editor.execute(
+                f'INSERT INTO {table}_search (rowid, search_document) '
+                f'SELECT id, search_document FROM {table}'
+            )
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table in SEARCH_TABLES:
+        if vendor == 'postgresql':
+            schema_editor.execute(f'DROP INDEX IF EXISTS {table}_search_trgm')
+        elif vendor == 'sqlite':
+            schema_editor.execute(f'DROP TABLE IF EXISTS {table}_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0054_search_document'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_search_documents, reverse_code=migrations.RunPython.noop),
+        migrations.RunPython(create_search_indexes, reverse_code=drop_search_indexes),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.22 on 2026-10-19 16:26
+
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_total_cost(apps, schema_editor):
+    """Заполняет сохранённую стоимость существующих заказов по их позициям."""
+    Order = apps.get_model('foodcartapp', 'Order')
+    OrderItem = apps.get_model('foodcartapp', 'OrderItem')
+
+    items_cost = (
+        OrderItem.objects
+        .filter(order=OuterRef('pk'))
+        .values('order')
+        .annotate(cost=Sum(F('quantity') * F('price_at_purchase')))
+        .values('cost')
+    )
+    Order.objects.update(
+        total_cost=Coalesce(
+            Subquery(items_cost),
+            0,
+            output_field=DecimalField(max_digits=10, decimal_places=2)
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0056_product_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='total_cost',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10, verbose_name='Стоимость заказа'),
+        ),
+        migrations.RunPython(fill_total_cost, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 4.2.22 on 2026-10-19 16:28
+
+import sqlite3
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import phonenumber_field.modelfields
+
+ARCHIVE_SEARCH_TABLE = 'foodcartapp_archivedorder'
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {ARCHIVE_SEARCH_TABLE}_search_trgm '
+            f'ON {ARCHIVE_SEARCH_TABLE} USING gin (search_document gin_trgm_ops)'
+        )
+    elif vendor == 'sqlite' and sqlite3.sqlite_version_info >= (3, 34):
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {ARCHIVE_SEARCH_TABLE}_search '
+            f"USING fts5(search_document, tokenize='trigram')"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {ARCHIVE_SEARCH_TABLE}_search_trgm')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {ARCHIVE_SEARCH_TABLE}_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0057_order_total_cost'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False, verbose_name='номер заказа')),
+                ('created_at', models.DateTimeField(db_index=True, verbose_name='Дата создания')),
+                ('called_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата звонка')),
+                ('delivered_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата доставки')),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата переноса в архив')),
+                ('client_name', models.CharField(max_length=50, verbose_name='Имя')),
+                ('surname', models.CharField(blank=True, max_length=50, verbose_name='Фамилия')),
+                ('phone', phonenumber_field.modelfields.PhoneNumberField(max_length=128, region='RU', verbose_name='Телефон')),
+                ('delivery_address', models.CharField(max_length=200, verbose_name='Адрес доставки')),
+                ('status', models.CharField(choices=[('NEW', 'Необработан'), ('PREPARING', 'Готовится'), ('DELIVERING', 'В доставке'), ('COMPLETED', 'Выполнен'), ('CANCELED', 'Отменён')], max_length=50, verbose_name='Статус заказов')),
+                ('payment_method', models.CharField(choices=[('cash', 'Наличными при получении'), ('card', 'Электронно')], max_length=50, verbose_name='Способ оплаты')),
+                ('customer_comment', models.TextField(blank=True, verbose_name='Комментарий')),
+                ('total_cost', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Стоимость заказа')),
+                ('search_document', models.TextField(blank=True, editable=False, verbose_name='Поисковый текст')),
+                ('restaurant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_orders', to='foodcartapp.restaurant', verbose_name='Готовил ресторан')),
+            ],
+            options={
+                'verbose_name': 'архивный заказ',
+                'verbose_name_plural': 'архивные заказы',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Количество')),
+                ('price_at_purchase', models.DecimalField(decimal_places=2, max_digits=8, verbose_name='Цена товара в заказе')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='foodcartapp.archivedorder', verbose_name='Заказ')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_order_items', to='foodcartapp.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'позиция архивного заказа',
+                'verbose_name_plural': 'позиции архивного заказа',
+            },
+        ),
+        migrations.RunPython(create_search_index, reverse_code=drop_search_index),
+    ]
@@ -0,0 +1,39 @@
+class SearchedFieldsMixin:
+    """
+    Запоминает при загрузке из БД поля, из которых собирается search_document,
+    чтобы сигналы пересобирали документы только когда эти поля поменялись.
+    """
+    searched_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_searched_fields()
+        return instance
+
+    def _get_searched_values(self):
+        return {
+            field_name: self.__dict__.get(self._meta.get_field(field_name).attname)
+            for field_name in self.searched_fields
+        }
+
+    def _remember_searched_fields(self):
+        self._loaded_searched_values = self._get_searched_values()
+
+    def get_changed_searched_fields(self, update_fields=None):
+        """Поля поиска, которые сохранение записало в БД с новым значением."""
+        loaded_values = getattr(self, '_loaded_searched_values', None)
+        if loaded_values is None:
+            changed_fields = set(self.searched_fields)
+        else:
+            changed_fields = {
+                field_name for field_name, value in self._get_searched_values().items()
+                if value != loaded_values[field_name]
+            }
+        if update_fields is not None:
+            changed_fields &= set(update_fields)
+        return changed_fields
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._remember_searched_fields()
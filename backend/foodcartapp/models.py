@@ -1,18 +1,23 @@
+from datetime import timedelta
+
 from django.conf import settings
 from django.core.validators import MinValueValidator
 from django.db import models
-from django.db.models import DecimalField, F, Prefetch, Sum
+from django.db.models import (DecimalField, F, Min, OuterRef, Prefetch, Q,
+                              Subquery, Sum)
 from django.db.models.functions import Coalesce
+from django.utils import timezone
 from geopy.distance import great_circle
 from phonenumber_field.modelfields import PhoneNumberField
 
 from geocoordinates.models import GeocodedAddress
-from geocoordinates.utils import fetch_coordinates
-from geocoordinates.utils import get_or_create_geocoded_address
+from geocoordinates.mixins import GeocodedAddressMixin
+
+from .mixins import SearchedFieldsMixin
 
 # Проверка работы деплоя
 
-class Restaurant(models.Model):
+class Restaurant(SearchedFieldsMixin, GeocodedAddressMixin, models.Model):
     name = models.CharField(
         'название',
         max_length=50
@@ -36,22 +41,7 @@ class Restaurant(models.Model):
         verbose_name='Геокодированный адрес ресторана'
     )
 
-    def save(self, *args, **kwargs):
-        if self.pk:
-            self.__original_address = self.address
-
-        address_changed = self.pk and self.address != self.__original_address
-
-        if not self.geocoded_address_id or address_changed:
-            self.geocoded_address = get_or_create_geocoded_address(self.address)
-
-        super().save(*args, **kwargs)
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.__original_address = self.address if self.pk else None
-
-
+    searched_fields = ['name']
 
     def get_distance_to(self, address):
         if not self.geocoded_address or self.geocoded_address.latitude is None or self.geocoded_address.longitude is None:
@@ -83,13 +73,28 @@ class ProductQuerySet(models.QuerySet):
         )
         return self.filter(pk__in=products)
 
+    def prefetch_available_menu_items(self):
+        return self.prefetch_related(
+            Prefetch(
+                'menu_items',
+                queryset=(
+                    RestaurantMenuItem.objects
+                    .filter(availability=True)
+                    .select_related('restaurant')
+                ),
+                to_attr='available_menu_items'
+            )
+        )
+
 
-class ProductCategory(models.Model):
+class ProductCategory(SearchedFieldsMixin, models.Model):
     name = models.CharField(
         'название',
         max_length=50
     )
 
+    searched_fields = ['name']
+
     class Meta:
         verbose_name = 'категория'
         verbose_name_plural = 'категории'
@@ -98,7 +103,7 @@ class ProductCategory(models.Model):
         return self.name
 
 
-class Product(models.Model):
+class Product(SearchedFieldsMixin, models.Model):
     name = models.CharField(
         'название',
         max_length=50
@@ -120,6 +125,12 @@ class Product(models.Model):
     image = models.ImageField(
         'картинка'
     )
+    image_variants = models.JSONField(
+        'варианты картинки',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     special_status = models.BooleanField(
         'спец.предложение',
         default=False,
@@ -130,9 +141,16 @@ class Product(models.Model):
         max_length=200,
         blank=True,
     )
+    search_document = models.TextField(
+        'поисковый текст',
+        blank=True,
+        editable=False,
+    )
 
     objects = ProductQuerySet.as_manager()
 
+    searched_fields = ['name', 'category']
+
     class Meta:
         verbose_name = 'товар'
         verbose_name_plural = 'товары'
@@ -166,6 +184,13 @@ class RestaurantMenuItem(models.Model):
         unique_together = [
             ['restaurant', 'product']
         ]
+        indexes = [
+            models.Index(
+                fields=['product', 'restaurant'],
+                condition=Q(availability=True),
+                name='menuitem_available_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.restaurant.name} - {self.product.name}'
@@ -188,65 +213,28 @@ class OrderQuerySet(models.QuerySet):
         )
         return annotated_queryset
 
-    def prefetch_available_restaurants(self):
-        return self.prefetch_related(
-            Prefetch(
-                'items__product__menu_items',
-                queryset=RestaurantMenuItem.objects.filter(availability=True),
-                to_attr='available_product_menu_items'
-            )
+    def archivable(self, created_before):
+        return self.filter(
+            status__in=[Order.STATUS_COMPLETED, Order.STATUS_CANCELED],
+            created_at__lt=created_before,
         )
 
-    def get_matching_restaurants_for_order(self, order):
-        if not order.items.exists():
-            return []
-
-        if not order.delivery_address:
-            return []
-
-        restaurants_for_each_product = []
-        for item in order.items.all():
-            available_restaurants = [
-                menu_item.restaurant
-                for menu_item in getattr(item.product, 'available_product_menu_items', [])
-            ]
-            if not available_restaurants:
-                return []
-            restaurants_for_each_product.append(set(available_restaurants))
-
-        if not restaurants_for_each_product:
-            return []
-
-        suitable_restaurants_set = set.intersection(*restaurants_for_each_product)
-
-        delivery_coords = fetch_coordinates(settings.YANDEX_GEOCODER_API_KEY, order.delivery_address)
-        if not delivery_coords:
-            return []
-
-        delivery_lat, delivery_lon = float(delivery_coords[1]), float(delivery_coords[0])
-
-        restaurants_with_distance = []
-        for restaurant in suitable_restaurants_set:
-            restaurant_coords = fetch_coordinates(settings.YANDEX_GEOCODER_API_KEY, restaurant.address)
-
-            if not restaurant_coords:
-                continue
-
-            restaurant_lon, restaurant_lat = float(restaurant_coords[0]), float(restaurant_coords[1])
-
-            distance = great_circle(
-                (delivery_lat, delivery_lon),
-                (restaurant_lat, restaurant_lon)
-            ).km
-
-            restaurant.distance = round(distance)
-            restaurants_with_distance.append(restaurant)
-
-        sorted_restaurants = sorted(
-            [r for r in restaurants_with_distance if hasattr(r, 'distance')],
-            key=lambda r: r.distance
+    def update_total_cost(self):
+        """Пересчитывает сохранённую стоимость заказов одним UPDATE."""
+        items_cost = (
+            OrderItem.objects
+            .filter(order=OuterRef('pk'))
+            .values('order')
+            .annotate(cost=Sum(F('quantity') * F('price_at_purchase')))
+            .values('cost')
+        )
+        return self.update(
+            total_cost=Coalesce(
+                Subquery(items_cost),
+                0,
+                output_field=DecimalField(max_digits=10, decimal_places=2)
+            )
         )
-        return sorted_restaurants
 
 
 class PaymentMethod(models.TextChoices):
@@ -254,7 +242,7 @@ class PaymentMethod(models.TextChoices):
     CARD = 'card', 'Электронно'
 
 
-class Order(models.Model):
+class Order(SearchedFieldsMixin, GeocodedAddressMixin, models.Model):
     STATUS_NEW = 'NEW'
     STATUS_PREPARING = 'PREPARING'
     STATUS_DELIVERING = 'DELIVERING'
@@ -338,23 +326,40 @@ class Order(models.Model):
         on_delete=models.SET_NULL,
         db_index=True,
     )
+    total_cost = models.DecimalField(
+        'Стоимость заказа',
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        editable=False,
+    )
+    search_document = models.TextField(
+        'Поисковый текст',
+        blank=True,
+        editable=False,
+    )
 
     objects = OrderQuerySet.as_manager()
 
-    def save(self, *args, **kwargs):
-        if not self.pk or self.delivery_address != self.__original_delivery_address or not self.geocoded_delivery_address_id:
-            self.geocoded_delivery_address = get_or_create_geocoded_address(self.delivery_address)
-        super().save(*args, **kwargs)
-
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.__original_delivery_address = self.delivery_address if self.pk else None
+    address_field = 'delivery_address'
+    geocoded_address_field = 'geocoded_delivery_address'
+    searched_fields = ['client_name', 'surname', 'phone', 'delivery_address', 'restaurant']
 
     class Meta:
         ordering = ['id']
         verbose_name = 'заказ'
         verbose_name_plural = 'заказы'
+        indexes = [
+            models.Index(
+                fields=['created_at'],
+                condition=Q(status__in=['NEW', 'PREPARING']),
+                name='order_active_created_idx',
+            ),
+            models.Index(
+                fields=['status', 'created_at'],
+                name='order_status_created_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'Заказ № {self.id} от {self.client_name} {self.surname if self.surname else ""}'
@@ -390,4 +395,224 @@ class OrderItem(models.Model):
         unique_together = [['order', 'product']]
 
     def __str__(self):
-        return f'{self.quantity} x {self.product.name} для заказа №{self.order.id}'
+        return f'{self.quantity} x {self.product.name} для заказа №{self.order_id}'
+
+
+class BannerQuerySet(models.QuerySet):
+    def active(self, moment):
+        return self.filter(
+            Q(active_from__isnull=True) | Q(active_from__lte=moment),
+            Q(active_until__isnull=True) | Q(active_until__gt=moment),
+        )
+
+    def get_next_change(self, moment):
+        """Ближайший момент, когда набор активных баннеров поменяется."""
+        changes = self.aggregate(
+            next_start=Min('active_from', filter=Q(active_from__gt=moment)),
+            next_end=Min('active_until', filter=Q(active_until__gt=moment)),
+        )
+        upcoming_changes = [change for change in changes.values() if change]
+        return min(upcoming_changes) if upcoming_changes else None
+
+
+class Banner(models.Model):
+    title = models.CharField(
+        'заголовок',
+        max_length=50,
+    )
+    image = models.ImageField(
+        'картинка',
+    )
+    text = models.CharField(
+        'текст',
+        max_length=200,
+        blank=True,
+    )
+    position = models.PositiveIntegerField(
+        'порядок',
+        default=0,
+        db_index=True,
+    )
+    active_from = models.DateTimeField(
+        'показывать с',
+        null=True,
+        blank=True,
+        db_index=True,
+    )
+    active_until = models.DateTimeField(
+        'показывать до',
+        null=True,
+        blank=True,
+        db_index=True,
+    )
+
+    objects = BannerQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['position', 'id']
+        verbose_name = 'баннер'
+        verbose_name_plural = 'баннеры'
+
+    def __str__(self):
+        return self.title
+
+
+def get_idempotency_key_expiry():
+    return timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+
+
+class IdempotencyKeyQuerySet(models.QuerySet):
+    def expired(self):
+        return self.filter(created_at__lt=get_idempotency_key_expiry())
+
+
+class IdempotencyKey(models.Model):
+    key = models.CharField(
+        'ключ',
+        max_length=255,
+        unique=True,
+    )
+    request_hash = models.CharField(
+        'хеш запроса',
+        max_length=64,
+    )
+    response_status = models.PositiveSmallIntegerField(
+        'код ответа',
+        null=True,
+        blank=True,
+    )
+    response_body = models.JSONField(
+        'тело ответа',
+        null=True,
+        blank=True,
+    )
+    created_at = models.DateTimeField(
+        'создан',
+        default=timezone.now,
+        db_index=True,
+    )
+
+    objects = IdempotencyKeyQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'ключ идемпотентности'
+        verbose_name_plural = 'ключи идемпотентности'
+
+    def __str__(self):
+        return self.key
+
+    def is_expired(self):
+        return self.created_at < get_idempotency_key_expiry()
+
+
+class ArchivedOrder(models.Model):
+    id = models.IntegerField(
+        'номер заказа',
+        primary_key=True,
+    )
+    created_at = models.DateTimeField(
+        'Дата создания',
+        db_index=True,
+    )
+    called_at = models.DateTimeField(
+        'Дата звонка',
+        blank=True,
+        null=True,
+    )
+    delivered_at = models.DateTimeField(
+        'Дата доставки',
+        blank=True,
+        null=True,
+    )
+    archived_at = models.DateTimeField(
+        'Дата переноса в архив',
+        default=timezone.now,
+    )
+    client_name = models.CharField(
+        'Имя',
+        max_length=50,
+    )
+    surname = models.CharField(
+        'Фамилия',
+        max_length=50,
+        blank=True,
+    )
+    phone = PhoneNumberField(
+        'Телефон',
+        region='RU',
+    )
+    delivery_address = models.CharField(
+        'Адрес доставки',
+        max_length=200,
+    )
+    status = models.CharField(
+        'Статус заказов',
+        max_length=50,
+        choices=Order.ORDER_STATUSES,
+    )
+    payment_method = models.CharField(
+        'Способ оплаты',
+        max_length=50,
+        choices=PaymentMethod.choices,
+    )
+    customer_comment = models.TextField(
+        'Комментарий',
+        blank=True,
+    )
+    restaurant = models.ForeignKey(
+        Restaurant,
+        verbose_name='Готовил ресторан',
+        related_name='archived_orders',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+    total_cost = models.DecimalField(
+        'Стоимость заказа',
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+    )
+    search_document = models.TextField(
+        'Поисковый текст',
+        blank=True,
+        editable=False,
+    )
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'архивный заказ'
+        verbose_name_plural = 'архивные заказы'
+
+    def __str__(self):
+        return f'Архивный заказ № {self.id} от {self.client_name} {self.surname if self.surname else ""}'
+
+
+class ArchivedOrderItem(models.Model):
+    order = models.ForeignKey(
+        ArchivedOrder,
+        on_delete=models.CASCADE,
+        related_name='items',
+        verbose_name='Заказ'
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.PROTECT,
+        related_name='archived_order_items',
+        verbose_name='Товар'
+    )
+    quantity = models.PositiveIntegerField(
+        'Количество',
+    )
+    price_at_purchase = models.DecimalField(
+        'Цена товара в заказе',
+        max_digits=8,
+        decimal_places=2,
+    )
+
+    class Meta:
+        verbose_name = 'позиция архивного заказа'
+        verbose_name_plural = 'позиции архивного заказа'
+
+    def __str__(self):
+        return f'{self.quantity} x {self.product.name} для заказа №{self.order_id}'
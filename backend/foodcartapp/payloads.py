@@ -0,0 +1,125 @@
+import gzip
+import json
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_etags
+
+from star_burger.db_router import use_primary
+from star_burger.metrics import record_cache_lookup
+
+from .versions import get_versions
+
+GZIP_RE = re.compile(r'\bgzip\b')
+PAYLOAD_WAIT_STEP = 0.05
+
+
+def dump_json(data):
+    return json.dumps(
+        data,
+        cls=DjangoJSONEncoder,
+        ensure_ascii=False,
+        separators=(',', ':'),
+    ).encode('utf-8')
+
+
+def make_etag(payload_name, version):
+    return f'"{payload_name}-{version}"'
+
+
+def make_gzip_etag(etag):
+    """У сжатого и несжатого тела разные байты, поэтому и сильные ETag у них разные."""
+    return f'{etag[:-1]}-gzip"'
+
+
+def get_requested_etag(request, etags):
+    """Клиент мог закешировать любое из представлений, 304 годится для обоих."""
+    request_etags = {
+        etag.removeprefix('W/')
+        for etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    }
+    return next((etag for etag in etags if etag in request_etags), etags[0])
+
+
+def build_payload(payload_name, version, build_data):
+    with use_primary():
+        body = dump_json(build_data())
+    return {
+        'etag': make_etag(payload_name, version),
+        'last_modified': version // 1_000_000,
+        'body': body,
+        'gzip_body': gzip.compress(body),
+    }
+
+
+def get_payload(payload_name, version, build_data):
+    """Достаёт готовый JSON из кеша, собирая его не более чем в одном воркере."""
+    payload_key = f'payload:{payload_name}:{version}'
+    latest_payload_key = f'payload:{payload_name}:latest'
+    lock_key = f'{payload_key}:lock'
+
+    payload = cache.get(payload_key)
+    record_cache_lookup(1, int(payload is not None))
+    if payload:
+        return payload
+
+    if cache.add(lock_key, True, timeout=settings.PAYLOAD_LOCK_TIMEOUT):
+        try:
+            payload = build_payload(payload_name, version, build_data)
+            cache.set_many(
+                {payload_key: payload, latest_payload_key: payload},
+                timeout=settings.PAYLOAD_CACHE_TIMEOUT,
+            )
+        finally:
+            cache.delete(lock_key)
+        return payload
+
+    stale_payload = cache.get(latest_payload_key)
+    if stale_payload:
+        return stale_payload
+
+    waited = 0
+    while waited < settings.PAYLOAD_LOCK_TIMEOUT:
+        time.sleep(PAYLOAD_WAIT_STEP)
+        waited += PAYLOAD_WAIT_STEP
+        payload = cache.get(payload_key)
+        if payload:
+            return payload
+    return build_payload(payload_name, version, build_data)
+
+
+def get_payload_version(version_names):
+    return max(get_versions(*version_names).values())
+
+
+def get_payload_response(request, payload_name, version_names, build_data):
+    version = get_payload_version(version_names)
+    use_gzip = bool(GZIP_RE.search(request.META.get('HTTP_ACCEPT_ENCODING', '')))
+    etag = make_etag(payload_name, version)
+    etags = [make_gzip_etag(etag), etag] if use_gzip else [etag, make_gzip_etag(etag)]
+    not_modified_response = get_conditional_response(
+        request,
+        etag=get_requested_etag(request, etags),
+        last_modified=version // 1_000_000,
+    )
+    if not_modified_response:
+        return not_modified_response
+
+    payload = get_payload(payload_name, version, build_data)
+
+    response = HttpResponse(content_type='application/json')
+    if use_gzip:
+        response.content = payload['gzip_body']
+        response['Content-Encoding'] = 'gzip'
+        response['ETag'] = make_gzip_etag(payload['etag'])
+    else:
+        response.content = payload['body']
+        response['ETag'] = payload['etag']
+    response['Last-Modified'] = http_date(payload['last_modified'])
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
@@ -0,0 +1,115 @@
+import sqlite3
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Order, Product
+
+SEARCH_BATCH_SIZE = 1000
+FTS_MIN_WORD_LENGTH = 3
+
+
+def normalize_search_text(*parts):
+    text = ' '.join(str(part) for part in parts if part)
+    return ' '.join(text.split()).casefold()
+
+
+def build_order_search_document(order):
+    return normalize_search_text(
+        order.id,
+        order.client_name,
+        order.surname,
+        order.phone,
+        order.delivery_address,
+        order.restaurant.name if order.restaurant else '',
+        *[item.product.name for item in order.items.all()],
+    )
+
+
+def build_product_search_document(product):
+    return normalize_search_text(
+        product.name,
+        product.category.name if product.category else '',
+    )
+
+
+def get_fts_table(model):
+    return f'{model._meta.db_table}_search'
+
+
+def supports_fts():
+    """На SQLite индекс строится на FTS5 с триграммным токенайзером."""
+    return connection.vendor == 'sqlite' and sqlite3.sqlite_version_info >= (3, 34)
+
+
+def save_search_documents(model, documents):
+    model.objects.bulk_update(
+        [model(pk=pk, search_document=document) for pk, document in documents.items()],
+        ['search_document'],
+        batch_size=SEARCH_BATCH_SIZE,
+    )
+    index_search_documents(model, documents)
+
+
+def index_search_documents(model, documents):
+    if supports_fts() and documents:
+        fts_table = get_fts_table(model)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {fts_table} WHERE rowid = %s',
+                [(pk,) for pk in documents],
+            )
+            cursor.executemany(
+                f'INSERT INTO {fts_table} (rowid, search_document) VALUES (%s, %s)',
+                list(documents.items()),
+            )
+
+
+def delete_search_documents(model, pks):
+    if supports_fts():
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {get_fts_table(model)} WHERE rowid = %s',
+                [(pk,) for pk in pks],
+            )
+
+
+def update_order_search_documents(order_ids):
+    order_ids = list(order_ids)
+    for start in range(0, len(order_ids), SEARCH_BATCH_SIZE):
+        orders = (
+            Order.objects
+            .filter(id__in=order_ids[start:start + SEARCH_BATCH_SIZE])
+            .select_related('restaurant')
+            .prefetch_related('items__product')
+        )
+        save_search_documents(Order, {
+            order.id: build_order_search_document(order)
+            for order in orders
+        })
+
+
+def update_product_search_documents(product_ids):
+    products = Product.objects.filter(id__in=list(product_ids)).select_related('category')
+    save_search_documents(Product, {
+        product.id: build_product_search_document(product)
+        for product in products
+    })
+
+
+def search_queryset(queryset, search_term):
+    """
+    Ищет по заранее собранному search_document в нижнем регистре. На PostgreSQL
+    LIKE '%…%' обслуживает GIN-индекс с gin_trgm_ops, на SQLite — таблица FTS5.
+    """
+    fts_table = get_fts_table(queryset.model)
+    for word in normalize_search_text(search_term).split():
+        if supports_fts() and len(word) >= FTS_MIN_WORD_LENGTH:
+            phrase = '"{}"'.format(word.replace('"', '""'))
+            queryset = queryset.filter(pk__in=RawSQL(
+                f'SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH %s',
+                [phrase],
+            ))
+        else:
+            queryset = queryset.filter(search_document__contains=word)
+    return queryset
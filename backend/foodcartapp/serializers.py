@@ -7,7 +7,7 @@ from .models import Order, OrderItem, Product
 
 
 class OrderItemSerializer(serializers.Serializer):
-    product = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
+    product = serializers.IntegerField(min_value=1)
     quantity = serializers.IntegerField(min_value=1)
 
 
@@ -29,15 +29,45 @@ class OrderSerializer(serializers.ModelSerializer):
             'products',
         ]
 
+    def validate_products(self, order_items):
+        product_ids = [item['product'] for item in order_items]
+
+        duplicate_ids = sorted({
+            product_id for product_id in product_ids
+            if product_ids.count(product_id) > 1
+        })
+        if duplicate_ids:
+            raise serializers.ValidationError(
+                f'Товары указаны несколько раз: {duplicate_ids}'
+            )
+
+        products = self.context.get('products')
+        if products is None:
+            products = Product.objects.available().in_bulk(product_ids)
+
+        unknown_ids = sorted(set(product_ids) - products.keys())
+        if unknown_ids:
+            raise serializers.ValidationError(
+                f'Товары не найдены или недоступны: {unknown_ids}'
+            )
+
+        for item in order_items:
+            item['product'] = products[item['product']]
+        return order_items
+
     def create(self, validated_data):
         order_items_payload = validated_data.pop('products')
 
-        delivery_address_str = validated_data['delivery_address']
-        geocoded_address_obj = get_or_create_geocoded_address(delivery_address_str)
+        if 'geocoded_delivery_address' not in validated_data:
+            delivery_address_str = validated_data['delivery_address']
+            validated_data['geocoded_delivery_address'] = get_or_create_geocoded_address(delivery_address_str)
 
-        validated_data['geocoded_delivery_address'] = geocoded_address_obj
+        validated_data['total_cost'] = sum(
+            item_payload['product'].price * item_payload['quantity']
+            for item_payload in order_items_payload
+        )
 
-        with transaction.atomic():
+        with transaction.atomic(savepoint=False):
             order_instance = super().create(validated_data)
 
             order_items_to_create = []
@@ -0,0 +1,107 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import (Banner, Order, OrderItem, Product, ProductCategory,
+                     Restaurant, RestaurantMenuItem)
+from .search import (delete_search_documents, update_order_search_documents,
+                     update_product_search_documents)
+from .versions import bump_version, get_order_version_name
+
+
+def bump_version_on_commit(*names):
+    transaction.on_commit(partial(bump_version, *names))
+
+
+def is_order_deletion(origin):
+    """Позиции удаляются каскадом вместе с заказом, пересчитывать заказ не нужно."""
+    return getattr(origin, 'model', type(origin)) is Order
+
+
+@receiver([post_save, post_delete], sender=Order)
+def bump_order_version(sender, instance, **kwargs):
+    bump_version_on_commit(get_order_version_name(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=OrderItem)
+def bump_order_version_on_item_change(sender, instance, **kwargs):
+    bump_version_on_commit(get_order_version_name(instance.order_id))
+
+
+@receiver([post_save, post_delete], sender=OrderItem)
+def update_order_total_cost(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or is_order_deletion(origin):
+        return
+    Order.objects.filter(pk=instance.order_id).update_total_cost()
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=RestaurantMenuItem)
+def bump_menu_version(sender, instance, **kwargs):
+    bump_version_on_commit('menu')
+
+
+@receiver([post_save, post_delete], sender=Restaurant)
+def bump_restaurants_version(sender, instance, **kwargs):
+    bump_version_on_commit('restaurants')
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=ProductCategory)
+@receiver([post_save, post_delete], sender=Restaurant)
+@receiver([post_save, post_delete], sender=RestaurantMenuItem)
+def bump_catalog_version(sender, instance, **kwargs):
+    bump_version_on_commit('catalog')
+
+
+@receiver([post_save, post_delete], sender=Banner)
+def bump_banners_version(sender, instance, **kwargs):
+    bump_version_on_commit('banners')
+
+
+@receiver(post_save, sender=Order)
+def update_order_search_document(sender, instance, update_fields=None, **kwargs):
+    if instance.get_changed_searched_fields(update_fields):
+        transaction.on_commit(partial(update_order_search_documents, [instance.pk]))
+
+
+@receiver([post_save, post_delete], sender=OrderItem)
+def update_order_search_document_on_item_change(sender, instance, origin=None, **kwargs):
+    if is_order_deletion(origin):
+        return
+    transaction.on_commit(partial(update_order_search_documents, [instance.order_id]))
+
+
+def is_name_changed(instance, created, update_fields):
+    return not created and 'name' in instance.get_changed_searched_fields(update_fields)
+
+
+@receiver(post_save, sender=Product)
+def update_product_search_document(sender, instance, created=False, update_fields=None, **kwargs):
+    if instance.get_changed_searched_fields(update_fields):
+        transaction.on_commit(partial(update_product_search_documents, [instance.pk]))
+    if is_name_changed(instance, created, update_fields):
+        order_ids = Order.objects.filter(items__product=instance).values_list('id', flat=True)
+        transaction.on_commit(partial(update_order_search_documents, order_ids))
+
+
+@receiver(post_save, sender=ProductCategory)
+def update_category_search_documents(sender, instance, created=False, update_fields=None, **kwargs):
+    if is_name_changed(instance, created, update_fields):
+        product_ids = instance.products.values_list('id', flat=True)
+        transaction.on_commit(partial(update_product_search_documents, product_ids))
+
+
+@receiver(post_save, sender=Restaurant)
+def update_restaurant_search_documents(sender, instance, created=False, update_fields=None, **kwargs):
+    if is_name_changed(instance, created, update_fields):
+        order_ids = instance.orders.values_list('id', flat=True)
+        transaction.on_commit(partial(update_order_search_documents, order_ids))
+
+
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=Product)
+def delete_search_document(sender, instance, **kwargs):
+    transaction.on_commit(partial(delete_search_documents, sender, [instance.pk]))
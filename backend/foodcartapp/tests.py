@@ -0,0 +1,352 @@
+import gzip
+import io
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from foodcartapp.archive import archive_order_batch, archive_orders
+from foodcartapp.models import (ArchivedOrder, ArchivedOrderItem, IdempotencyKey,
+                                Order, OrderItem, Product, ProductCategory,
+                                Restaurant, RestaurantMenuItem)
+from foodcartapp.versions import get_order_version_name, get_versions
+from geocoordinates.models import GeocodedAddress
+
+ORDER_ADDRESS = 'Москва, ул. Тверская, д. 10'
+
+
+def create_available_product():
+    GeocodedAddress.objects.create(address=ORDER_ADDRESS, latitude=55.76, longitude=37.6)
+    category = ProductCategory.objects.create(name='Бургеры')
+    product = Product.objects.create(name='Чизбургер', category=category, price=100, image='cheeseburger.jpg')
+    restaurant = Restaurant.objects.create(name='Star Burger Тверская', address=ORDER_ADDRESS)
+    RestaurantMenuItem.objects.create(restaurant=restaurant, product=product, availability=True)
+    return product
+
+
+class ProductListApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = create_available_product()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_unchanged_catalog_is_answered_from_cache(self):
+        for url in ['/api/products/', '/api/banners/']:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+            with self.assertNumQueries(0):
+                not_modified_response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(not_modified_response.status_code, 304)
+
+            with self.assertNumQueries(0):
+                not_modified_response = self.client.get(
+                    url,
+                    HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+                )
+            self.assertEqual(not_modified_response.status_code, 304)
+
+    def test_gzip_and_plain_bodies_have_different_etags(self):
+        gzip_response = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip')
+        plain_response = self.client.get('/api/products/')
+
+        self.assertEqual(gzip_response['Content-Encoding'], 'gzip')
+        self.assertFalse(plain_response.has_header('Content-Encoding'))
+        self.assertEqual(gzip.decompress(gzip_response.content), plain_response.content)
+        self.assertNotEqual(gzip_response['ETag'], plain_response['ETag'])
+
+        for etag in [gzip_response['ETag'], plain_response['ETag']]:
+            for accept_encoding in ['gzip', '']:
+                response = self.client.get(
+                    '/api/products/',
+                    HTTP_ACCEPT_ENCODING=accept_encoding,
+                    HTTP_IF_NONE_MATCH=etag,
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_stream_is_enabled_only_by_true_values(self):
+        for value in ['1', 'true', 'True']:
+            response = self.client.get('/api/products/', {'stream': value})
+            self.assertTrue(response.streaming, value)
+            response.close()
+        for value in ['0', 'false', '']:
+            response = self.client.get('/api/products/', {'stream': value})
+            self.assertFalse(response.streaming, value)
+            self.assertEqual(response.json()[0]['id'], self.product.id)
+
+
+class RegisterOrderIdempotencyTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = create_available_product()
+
+    def get_order_payload(self, **fields):
+        return {
+            'products': [{'product': self.product.id, 'quantity': 2}],
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79123456789',
+            'address': ORDER_ADDRESS,
+            **fields,
+        }
+
+    def post_order(self, payload, key):
+        return self.client.post(
+            '/api/order/',
+            data=payload,
+            content_type='application/json',
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_replay_returns_stored_response_without_new_order(self):
+        first_response = self.post_order(self.get_order_payload(), 'order-1')
+        replayed_response = self.post_order(self.get_order_payload(), 'order-1')
+
+        self.assertEqual(first_response.status_code, 201)
+        self.assertEqual(replayed_response.status_code, 201)
+        self.assertEqual(replayed_response.json(), first_response.json())
+        self.assertEqual(replayed_response['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_key_reused_with_other_body_is_rejected(self):
+        self.post_order(self.get_order_payload(), 'order-1')
+        response = self.post_order(self.get_order_payload(firstname='Пётр'), 'order-1')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_validation_error_does_not_store_key(self):
+        response = self.post_order(self.get_order_payload(products=[]), 'order-1')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        response = self.post_order(self.get_order_payload(), 'order-1')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Order.objects.count(), 1)
+
+
+class RegisterOrderGeocodingTest(TransactionTestCase):
+    def test_keyed_order_is_geocoded_outside_transaction(self):
+        product = create_available_product()
+        geocoder_calls_in_transaction = []
+
+        def fetch_coordinates(apikey, address):
+            geocoder_calls_in_transaction.append(connection.in_atomic_block)
+            return (37.59, 55.75)
+
+        with mock.patch('geocoordinates.utils.fetch_coordinates', side_effect=fetch_coordinates):
+            response = self.client.post(
+                '/api/order/',
+                data={
+                    'products': [{'product': product.id, 'quantity': 1}],
+                    'firstname': 'Иван',
+                    'lastname': 'Петров',
+                    'phonenumber': '+79123456789',
+                    'address': 'Москва, Новый Арбат, 1',
+                },
+                content_type='application/json',
+                HTTP_IDEMPOTENCY_KEY='order-1',
+            )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(geocoder_calls_in_transaction, [False])
+        order = Order.objects.get()
+        self.assertEqual(order.geocoded_delivery_address.address, 'Москва, Новый Арбат, 1')
+        self.assertTrue(IdempotencyKey.objects.filter(key='order-1').exists())
+
+
+@override_settings(PARTNER_API_TOKENS=['partner-token'])
+class BulkOrdersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = create_available_product()
+
+    def get_order_line(self, **fields):
+        return json.dumps({
+            'products': [{'product': self.product.id, 'quantity': 2}],
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79123456789',
+            'address': 'Москва, Новый Арбат, 1',
+            **fields,
+        })
+
+    def post_lines(self, lines):
+        response = self.client.post(
+            '/api/orders/bulk/',
+            data='\n'.join(lines),
+            content_type='application/x-ndjson',
+            HTTP_AUTHORIZATION='Token partner-token',
+        )
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_results_are_reported_per_line(self):
+        results = self.post_lines([
+            self.get_order_line(),
+            '{"products": [',
+            '',
+            self.get_order_line(products=[{'product': 999, 'quantity': 1}]),
+            self.get_order_line(firstname='Пётр'),
+        ])
+
+        self.assertEqual([result['line'] for result in results], [1, 2, 4, 5])
+        self.assertEqual(
+            [result['status'] for result in results],
+            ['created', 'error', 'error', 'created'],
+        )
+        self.assertIn('products', results[2]['errors'])
+        created_orders = Order.objects.filter(id__in=[results[0]['id'], results[3]['id']])
+        self.assertEqual(
+            sorted(created_orders.values_list('client_name', 'total_cost')),
+            [('Иван', 200), ('Пётр', 200)],
+        )
+        self.assertFalse(created_orders.filter(geocoded_delivery_address__isnull=False).exists())
+
+    def test_geocode_orders_asks_geocoder_once_per_address(self):
+        results = self.post_lines([self.get_order_line()] * 3)
+        order_ids = [result['id'] for result in results]
+        versions = get_versions(*map(get_order_version_name, order_ids))
+
+        with mock.patch('geocoordinates.utils.fetch_coordinates', return_value=None) as fetch:
+            call_command('geocode_orders', stdout=io.StringIO())
+
+        self.assertEqual(fetch.call_count, 1)
+        self.assertFalse(Order.objects.filter(geocoded_delivery_address__isnull=True).exists())
+        new_versions = get_versions(*map(get_order_version_name, order_ids))
+        self.assertTrue(all(new_versions[name] != version for name, version in versions.items()))
+
+
+class ArchiveOrdersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = create_available_product()
+        cls.created_before = timezone.now() - timedelta(days=90)
+        cls.old_completed_order = cls.create_order(Order.STATUS_COMPLETED, days_ago=100)
+        cls.old_canceled_order = cls.create_order(Order.STATUS_CANCELED, days_ago=120)
+        cls.old_new_order = cls.create_order(Order.STATUS_NEW, days_ago=100)
+        cls.recent_completed_order = cls.create_order(Order.STATUS_COMPLETED, days_ago=10)
+
+    @classmethod
+    def create_order(cls, status, days_ago):
+        order = Order.objects.create(
+            client_name='Иван',
+            phone='+79123456789',
+            delivery_address=ORDER_ADDRESS,
+            status=status,
+            total_cost=200,
+        )
+        OrderItem.objects.create(order=order, product=cls.product, quantity=2, price_at_purchase=100)
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return order
+
+    def test_old_finished_orders_are_moved_with_items(self):
+        archived_counts = list(archive_orders(self.created_before, batch_size=1))
+
+        archived_ids = {self.old_completed_order.id, self.old_canceled_order.id}
+        self.assertEqual(archived_counts, [1, 1])
+        self.assertEqual(set(ArchivedOrder.objects.values_list('id', flat=True)), archived_ids)
+        self.assertEqual(set(ArchivedOrderItem.objects.values_list('order_id', flat=True)), archived_ids)
+        self.assertEqual(
+            set(Order.objects.values_list('id', flat=True)),
+            {self.old_new_order.id, self.recent_completed_order.id},
+        )
+        self.assertFalse(OrderItem.objects.filter(order_id__in=archived_ids).exists())
+        self.assertEqual(ArchivedOrder.objects.get(id=self.old_completed_order.id).total_cost, 200)
+
+    def test_failed_batch_leaves_orders_in_place(self):
+        order_ids = [self.old_completed_order.id, self.old_canceled_order.id]
+
+        with mock.patch('foodcartapp.archive.index_search_documents', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                archive_order_batch(order_ids, self.created_before)
+
+        self.assertFalse(ArchivedOrder.objects.exists())
+        self.assertFalse(ArchivedOrderItem.objects.exists())
+        self.assertEqual(Order.objects.filter(id__in=order_ids).count(), 2)
+        self.assertEqual(OrderItem.objects.filter(order_id__in=order_ids).count(), 2)
+
+    def test_order_changed_before_batch_is_skipped(self):
+        Order.objects.filter(pk=self.old_completed_order.pk).update(status=Order.STATUS_NEW)
+
+        archived_count = archive_order_batch([self.old_completed_order.id], self.created_before)
+
+        self.assertEqual(archived_count, 0)
+        self.assertTrue(Order.objects.filter(pk=self.old_completed_order.pk).exists())
+
+
+class SearchDocumentSignalsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = create_available_product()
+        cls.order = Order.objects.create(
+            client_name='Иван',
+            phone='+79123456789',
+            delivery_address=ORDER_ADDRESS,
+        )
+        OrderItem.objects.create(order=cls.order, product=cls.product, quantity=1, price_at_purchase=100)
+
+    def test_order_is_reindexed_only_when_searched_fields_change(self):
+        order = Order.objects.get(pk=self.order.pk)
+
+        with mock.patch('foodcartapp.signals.update_order_search_documents') as update:
+            with self.captureOnCommitCallbacks(execute=True):
+                order.status = Order.STATUS_PREPARING
+                order.save(update_fields=['status'])
+                order.customer_comment = 'Позвонить за час'
+                order.save()
+            update.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                order.client_name = 'Пётр'
+                order.save()
+            update.assert_called_once_with([order.pk])
+
+    def test_product_rename_reindexes_orders_without_extra_queries(self):
+        product = Product.objects.get(pk=self.product.pk)
+
+        with mock.patch('foodcartapp.signals.update_product_search_documents') as update_products, \
+                mock.patch('foodcartapp.signals.update_order_search_documents') as update_orders:
+            with self.captureOnCommitCallbacks(), self.assertNumQueries(1):
+                product.description = 'С двумя котлетами'
+                product.save()
+            update_products.assert_not_called()
+            update_orders.assert_not_called()
+
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(1):
+            product.name = 'Двойной чизбургер'
+            product.save()
+        self.order.refresh_from_db()
+        self.assertIn('двойной', self.order.search_document)
+
+
+class ImageVariantsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = create_available_product()
+
+    @mock.patch('foodcartapp.management.commands.generate_image_variants.generate_image_variants', return_value=1)
+    def test_new_image_is_left_to_management_command(self, generate_image_variants):
+        product = Product.objects.get(pk=self.product.pk)
+        product.image_variants = {'source': product.image.name, 'variants': {}}
+        product.save()
+        fresh_product = Product.objects.create(name='Гамбургер', price=80, image='hamburger.jpg')
+
+        with mock.patch('foodcartapp.thumbnails.get_executor') as get_executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                fresh_product.image = 'double-hamburger.jpg'
+                fresh_product.save()
+        get_executor.assert_not_called()
+
+        call_command('generate_image_variants', stdout=io.StringIO())
+
+        generate_image_variants.assert_called_once()
+        self.assertEqual(generate_image_variants.call_args.args[0], [fresh_product])
@@ -0,0 +1,131 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+from star_burger.images import VARIANT_FORMATS, render_variants
+
+from .models import Product
+from .versions import bump_version
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_VARIANT_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+    return _executor
+
+
+def discard_executor(executor):
+    """Сломанный пул больше не принимает задачи, следующий вызов создаст новый."""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+def get_variant_name(image_name, variant_format, width):
+    stem, _ = os.path.splitext(image_name)
+    extension = VARIANT_FORMATS[variant_format]['extension']
+    return f'variants/{stem}-{width}w.{extension}'
+
+
+def read_image(image):
+    with image.storage.open(image.name, 'rb') as image_file:
+        return image_file.read()
+
+
+def save_variants(image, variants):
+    saved_variants = {}
+    for variant_format, width, content in variants:
+        name = image.storage.save(
+            get_variant_name(image.name, variant_format, width),
+            ContentFile(content),
+        )
+        saved_variants.setdefault(variant_format, []).append({'width': width, 'name': name})
+    return {'source': image.name, 'variants': saved_variants}
+
+
+def has_fresh_variants(product):
+    return bool(product.image) and product.image_variants.get('source') == product.image.name
+
+
+def generate_image_variants(products):
+    """
+    Нарезает картинки продуктов в пуле процессов и сохраняет описание вариантов.
+    Возвращает количество обновлённых продуктов. Вызывается только из
+    management-команд: ожидание пула не должно держать запрос админки.
+    """
+    executor = get_executor()
+    futures = {}
+    for product in products:
+        if not product.image:
+            continue
+        try:
+            source = read_image(product.image)
+        except OSError:
+            logger.warning('Не удалось прочитать картинку продукта %s: %s', product.pk, product.image.name)
+            continue
+        try:
+            futures[product] = (
+                executor,
+                executor.submit(render_variants, source, settings.PRODUCT_IMAGE_WIDTHS),
+            )
+        except BrokenProcessPool:
+            logger.exception('Пул нарезки картинок сломан, продукт %s пропущен', product.pk)
+            discard_executor(executor)
+            executor = get_executor()
+
+    updated_count = 0
+    for product, (product_executor, future) in futures.items():
+        # Ошибка одной картинки не должна останавливать всю пачку: она только
+        # пишется в лог, а продукт остаётся без вариантов до следующего запуска.
+        try:
+            product.image_variants = save_variants(product.image, future.result())
+        except Exception as error:
+            logger.exception('Не удалось нарезать картинку продукта %s: %s', product.pk, product.image.name)
+            if isinstance(error, BrokenProcessPool):
+                discard_executor(product_executor)
+            continue
+        updated_count += (
+            Product.objects
+            .filter(pk=product.pk, image=product.image.name)
+            .update(image_variants=product.image_variants)
+        )
+
+    if updated_count:
+        bump_version('catalog')
+    return updated_count
+
+
+def get_image_srcset(product, variant_format):
+    variants = product.image_variants.get('variants', {}).get(variant_format, [])
+    return ', '.join(
+        f'{product.image.storage.url(variant["name"])} {variant["width"]}w'
+        for variant in variants
+    )
+
+
+def get_thumbnail_url(product, min_width):
+    """Самый маленький WebP-вариант не уже min_width, если вариантов нет — исходная картинка."""
+    variants = product.image_variants.get('variants', {}).get('webp', [])
+    if not has_fresh_variants(product) or not variants:
+        return product.image.url
+    wide_enough = [variant for variant in variants if variant['width'] >= min_width]
+    variant = min(wide_enough, key=lambda variant: variant['width']) if wide_enough else variants[-1]
+    return product.image.storage.url(variant['name'])
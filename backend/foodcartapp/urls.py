@@ -1,11 +1,14 @@
 from django.urls import path
 
-from .views import banners_list_api, product_list_api, register_order
+from .views import (banners_list_api, bootstrap_api, bulk_orders_api,
+                    product_list_api, register_order)
 
 app_name = 'foodcartapp'
 
 urlpatterns = [
     path('products/', product_list_api),
     path('banners/', banners_list_api),
+    path('bootstrap/', bootstrap_api),
     path('order/', register_order),
+    path('orders/bulk/', bulk_orders_api),
 ]
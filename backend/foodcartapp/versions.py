@@ -0,0 +1,63 @@
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from star_burger.metrics import record_cache_lookup
+
+VERSION_KEY_TEMPLATE = 'version:{}'
+
+ORDER_VERSION_PREFIX = 'order:'
+
+
+def _make_version():
+    return time.time_ns() // 1000
+
+
+def get_order_version_name(order_id):
+    return f'{ORDER_VERSION_PREFIX}{order_id}'
+
+
+def get_version_timeout(name):
+    """Версии заказов копятся без конца, поэтому живут ограниченно, остальные — вечно."""
+    if name.startswith(ORDER_VERSION_PREFIX):
+        return settings.ORDER_VERSION_CACHE_TIMEOUT
+    return None
+
+
+def get_versions(*names):
+    """Возвращает словарь {имя: версия}, недостающие версии создаются."""
+    keys = {name: VERSION_KEY_TEMPLATE.format(name) for name in names}
+    stored_versions = cache.get_many(keys.values())
+    record_cache_lookup(len(keys), len(stored_versions))
+
+    versions = {}
+    for name, key in keys.items():
+        version = stored_versions.get(key)
+        if version is None:
+            cache.add(key, _make_version(), timeout=get_version_timeout(name))
+            version = cache.get(key)
+        versions[name] = version
+    return versions
+
+
+def get_version(name):
+    return get_versions(name)[name]
+
+
+def bump_version(*names):
+    version = _make_version()
+    names_by_timeout = {}
+    for name in names:
+        names_by_timeout.setdefault(get_version_timeout(name), []).append(name)
+    for timeout, timeout_names in names_by_timeout.items():
+        cache.set_many(
+            {VERSION_KEY_TEMPLATE.format(name): version for name in timeout_names},
+            timeout=timeout,
+        )
+
+
+def expire_version(name, timeout):
+    """Версия сама сменится через timeout секунд."""
+    cache.touch(VERSION_KEY_TEMPLATE.format(name), timeout=max(math.ceil(timeout), 1))
@@ -1,74 +1,263 @@
-from django.http import JsonResponse
-from django.templatetags.static import static
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import render
+from django.utils import timezone
+from django.utils.safestring import mark_safe
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
-from .models import Product
+from geocoordinates.utils import get_or_create_geocoded_address
+from star_burger.images import VARIANT_FORMATS
+
+from .bulk_orders import import_orders
+from .models import Banner, IdempotencyKey, Product, ProductCategory
+from .payloads import (dump_json, get_payload, get_payload_response,
+                       get_payload_version)
 from .serializers import OrderSerializer
+from .thumbnails import get_image_srcset, has_fresh_variants
+from .versions import expire_version
 
+BOOTSTRAP_VERSION_NAMES = ['banners', 'catalog']
 
-def banners_list_api(request):
-    # FIXME move data to db?
-    return JsonResponse([
-        {
-            'title': 'Burger',
-            'src': static('burger.jpg'),
-            'text': 'Tasty Burger at your door step',
-        },
-        {
-            'title': 'Spices',
-            'src': static('food.jpg'),
-            'text': 'All Cuisines',
-        },
+TRUE_QUERY_VALUES = {'1', 'true', 'yes', 'on'}
+
+JSON_SCRIPT_ESCAPES = {
+    ord('<'): '\\u003C',
+    ord('>'): '\\u003E',
+    ord('&'): '\\u0026',
+}
+
+
+def serialize_product(product):
+    return {
+        'id': product.id,
+        'name': product.name,
+        'price': product.price,
+        'special_status': product.special_status,
+        'description': product.description,
+        'category': {
+            'id': product.category.id,
+            'name': product.category.name,
+        } if product.category else None,
+        'image': product.image.url,
+        'image_srcset': {
+            variant_format: get_image_srcset(product, variant_format)
+            for variant_format in VARIANT_FORMATS
+        } if has_fresh_variants(product) else {},
+        'restaurants': [
+            {
+                'id': menu_item.restaurant.id,
+                'name': menu_item.restaurant.name,
+            }
+            for menu_item in product.available_menu_items
+        ],
+    }
+
+
+def get_banners():
+    now = timezone.now()
+    next_change_at = Banner.objects.get_next_change(now)
+    if next_change_at:
+        expire_version('banners', (next_change_at - now).total_seconds())
+
+    return [
         {
-            'title': 'New York',
-            'src': static('tasty.jpg'),
-            'text': 'Food is incomplete without a tasty dessert',
+            'title': banner.title,
+            'src': banner.image.url,
+            'text': banner.text,
         }
-    ], safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
+        for banner in Banner.objects.active(now)
+    ]
+
+
+def get_available_products():
+    return (
+        Product.objects
+        .select_related('category')
+        .prefetch_available_menu_items()
+        .available()
+        .order_by('id')
+    )
+
+
+def get_products():
+    return [serialize_product(product) for product in get_available_products()]
+
+
+def stream_products():
+    products = get_available_products().iterator(
+        chunk_size=settings.PRODUCTS_STREAM_CHUNK_SIZE
+    )
+    yield b'['
+    for number, product in enumerate(products):
+        if number:
+            yield b','
+        yield dump_json(serialize_product(product))
+    yield b']'
+
+
+def get_products_page(cursor, limit):
+    products = list(get_available_products().filter(id__gt=cursor)[:limit + 1])
+    next_cursor = products[limit - 1].id if len(products) > limit else None
+    return {
+        'results': [serialize_product(product) for product in products[:limit]],
+        'next_cursor': next_cursor,
+    }
+
+
+def get_categories():
+    return list(ProductCategory.objects.order_by('id').values('id', 'name'))
+
+
+def get_bootstrap():
+    return {
+        'banners': get_banners(),
+        'categories': get_categories(),
+        'products': get_products(),
+    }
+
+
+def get_bootstrap_json():
+    """JSON для встраивания в <script> на главной странице."""
+    version = get_payload_version(BOOTSTRAP_VERSION_NAMES)
+    body = get_payload('bootstrap', version, get_bootstrap)['body'].decode('utf-8')
+    return mark_safe(body.translate(JSON_SCRIPT_ESCAPES))
+
+
+def start_page(request):
+    return render(request, 'index.html', context={
+        'bootstrap_json': get_bootstrap_json(),
     })
 
 
+def bootstrap_api(request):
+    return get_payload_response(request, 'bootstrap', BOOTSTRAP_VERSION_NAMES, get_bootstrap)
+
+
+def banners_list_api(request):
+    return get_payload_response(request, 'banners', ['banners'], get_banners)
+
+
 def product_list_api(request):
-    products = Product.objects.select_related('category').available()
-
-    dumped_products = []
-    for product in products:
-        dumped_product = {
-            'id': product.id,
-            'name': product.name,
-            'price': product.price,
-            'special_status': product.special_status,
-            'description': product.description,
-            'category': {
-                'id': product.category.id,
-                'name': product.category.name,
-            } if product.category else None,
-            'image': product.image.url,
-            'restaurant': {
-                'id': product.id,
-                'name': product.name,
-            }
-        }
-        dumped_products.append(dumped_product)
-    return JsonResponse(dumped_products, safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    if request.GET.get('stream', '').lower() in TRUE_QUERY_VALUES:
+        return StreamingHttpResponse(
+            stream_products(),
+            content_type='application/json',
+        )
 
+    if 'cursor' in request.GET or 'limit' in request.GET:
+        try:
+            cursor = int(request.GET.get('cursor', 0))
+            limit = int(request.GET.get('limit', settings.PRODUCTS_PAGE_MAX_LIMIT))
+        except ValueError:
+            return JsonResponse({'error': 'cursor и limit должны быть числами'}, status=400)
+        limit = min(max(limit, 1), settings.PRODUCTS_PAGE_MAX_LIMIT)
+        return JsonResponse(get_products_page(cursor, limit), json_dumps_params={
+            'ensure_ascii': False,
+        })
+
+    return get_payload_response(request, 'products', ['catalog'], get_products)
 
-@api_view(['POST'])
-@csrf_exempt
-def register_order(request):
-    serializer = OrderSerializer(data=request.data)
 
+def get_request_hash(data):
+    canonical_data = json.dumps(data, sort_keys=True, ensure_ascii=False, cls=DjangoJSONEncoder)
+    return hashlib.sha256(canonical_data.encode('utf-8')).hexdigest()
+
+
+def validate_order(data):
+    serializer = OrderSerializer(data=data)
     serializer.is_valid(raise_exception=True)
-    saved_order_instance = serializer.save()
+    return serializer
+
+
+def save_order(serializer, **extra_fields):
+    saved_order_instance = serializer.save(**extra_fields)
 
     response_serializer = OrderSerializer(saved_order_instance)
 
     return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+
+
+def create_order(data):
+    return save_order(validate_order(data))
+
+
+def replay_order_response(stored_key, request_hash):
+    if stored_key.request_hash != request_hash:
+        return Response(
+            {'detail': 'Idempotency-Key уже использован с другими данными заказа'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    response = Response(stored_key.response_body, status=stored_key.response_status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+@api_view(['POST'])
+@csrf_exempt
+def register_order(request):
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if not idempotency_key:
+        return create_order(request.data)
+
+    if len(idempotency_key) > IdempotencyKey._meta.get_field('key').max_length:
+        return Response(
+            {'detail': 'Слишком длинный Idempotency-Key'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    request_hash = get_request_hash(request.data)
+    stored_key = IdempotencyKey.objects.filter(key=idempotency_key).first()
+    if stored_key and not stored_key.is_expired():
+        return replay_order_response(stored_key, request_hash)
+
+    # Проверка и геокодирование идут до транзакции, чтобы медленный геокодер
+    # не держал её открытой. Ключ записывается в одной транзакции с заказом:
+    # если параллельный повтор успел сохранить такой же ключ, вставка упадёт,
+    # заказ откатится, а клиент получит ответ первого запроса.
+    serializer = validate_order(request.data)
+    geocoded_address = get_or_create_geocoded_address(serializer.validated_data['delivery_address'])
+    try:
+        with transaction.atomic():
+            if stored_key:
+                IdempotencyKey.objects.filter(pk=stored_key.pk).delete()
+            response = save_order(serializer, geocoded_delivery_address=geocoded_address)
+            IdempotencyKey.objects.create(
+                key=idempotency_key,
+                request_hash=request_hash,
+                response_status=response.status_code,
+                response_body=response.data,
+            )
+    except IntegrityError:
+        stored_key = IdempotencyKey.objects.filter(key=idempotency_key).first()
+        if not stored_key:
+            raise
+        return replay_order_response(stored_key, request_hash)
+
+    return response
+
+
+def has_partner_token(request):
+    authorization = request.headers.get('Authorization', '')
+    scheme, _, token = authorization.partition(' ')
+    return scheme == 'Token' and token in settings.PARTNER_API_TOKENS
+
+
+@csrf_exempt
+@require_POST
+def bulk_orders_api(request):
+    if not has_partner_token(request):
+        return JsonResponse({'detail': 'Неверный токен партнёра'}, status=403)
+
+    return StreamingHttpResponse(
+        import_orders(request, settings.BULK_ORDERS_BATCH_SIZE),
+        content_type='application/x-ndjson',
+    )
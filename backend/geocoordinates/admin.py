@@ -1,5 +1,7 @@
 from django.contrib import admin
 
+from star_burger.paginator import EstimatedCountPaginator
+
 from .models import GeocodedAddress
 
 
@@ -9,3 +11,5 @@ class GeocodedAddressAdmin(admin.ModelAdmin):
     search_fields = ('address',)
     list_filter = ('queried_at',)
     readonly_fields = ('queried_at',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
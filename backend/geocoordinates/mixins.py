@@ -0,0 +1,44 @@
+from .utils import get_or_create_geocoded_address
+
+
+class GeocodedAddressMixin:
+    """
+    Геокодирует адрес модели при сохранении, но только если адрес
+    поменялся с момента загрузки из БД и геокод не передали явно.
+    """
+    address_field = 'address'
+    geocoded_address_field = 'geocoded_address'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_address()
+        return instance
+
+    def _remember_address(self):
+        self._loaded_address = self.__dict__.get(self.address_field)
+        self._loaded_geocoded_address_id = self.__dict__.get(f'{self.geocoded_address_field}_id')
+
+    def _needs_geocoding(self, update_fields):
+        if update_fields is not None and self.address_field not in update_fields:
+            return False
+
+        address = getattr(self, self.address_field)
+        geocoded_address_id = getattr(self, f'{self.geocoded_address_field}_id')
+        if self._state.adding:
+            return not geocoded_address_id
+
+        address_changed = address != getattr(self, '_loaded_address', None)
+        geocode_supplied = geocoded_address_id != getattr(self, '_loaded_geocoded_address_id', None)
+        return address_changed and not geocode_supplied
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if self._needs_geocoding(update_fields):
+            address = getattr(self, self.address_field)
+            setattr(self, self.geocoded_address_field, get_or_create_geocoded_address(address))
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, self.geocoded_address_field}
+
+        super().save(*args, **kwargs)
+        self._remember_address()
@@ -1,3 +1,69 @@
+from unittest import mock
+
 from django.test import TestCase
 
-# Create your tests here.
+from foodcartapp.models import Order
+from geocoordinates.models import GeocodedAddress
+
+ORDER_ADDRESS = 'Москва, ул. Тверская, д. 10'
+NEW_ORDER_ADDRESS = 'Москва, Новый Арбат, 1'
+
+
+@mock.patch('geocoordinates.mixins.get_or_create_geocoded_address')
+class GeocodedAddressMixinTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.geocoded_address = GeocodedAddress.objects.create(
+            address=ORDER_ADDRESS,
+            latitude=55.76,
+            longitude=37.6,
+        )
+        cls.order = Order.objects.create(
+            client_name='Иван',
+            phone='+79123456789',
+            delivery_address=ORDER_ADDRESS,
+            geocoded_delivery_address=cls.geocoded_address,
+        )
+
+    def test_new_order_with_supplied_geocode_is_not_geocoded(self, get_or_create_geocoded_address):
+        order = Order.objects.create(
+            client_name='Пётр',
+            phone='+79123456789',
+            delivery_address=ORDER_ADDRESS,
+            geocoded_delivery_address=self.geocoded_address,
+        )
+
+        get_or_create_geocoded_address.assert_not_called()
+        self.assertEqual(order.geocoded_delivery_address, self.geocoded_address)
+
+    def test_status_change_leaves_geocode_alone(self, get_or_create_geocoded_address):
+        order = Order.objects.get(pk=self.order.pk)
+        order.status = Order.STATUS_PREPARING
+        order.save(update_fields=['status'])
+
+        order = Order.objects.get(pk=self.order.pk)
+        order.status = Order.STATUS_DELIVERING
+        order.save()
+
+        get_or_create_geocoded_address.assert_not_called()
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.STATUS_DELIVERING)
+        self.assertEqual(order.geocoded_delivery_address, self.geocoded_address)
+        self.assertEqual(GeocodedAddress.objects.count(), 1)
+
+    def test_address_change_is_geocoded_and_saved(self, get_or_create_geocoded_address):
+        new_geocoded_address = GeocodedAddress.objects.create(
+            address=NEW_ORDER_ADDRESS,
+            latitude=55.75,
+            longitude=37.59,
+        )
+        get_or_create_geocoded_address.return_value = new_geocoded_address
+
+        order = Order.objects.get(pk=self.order.pk)
+        order.delivery_address = NEW_ORDER_ADDRESS
+        order.save(update_fields=['delivery_address'])
+
+        get_or_create_geocoded_address.assert_called_once_with(NEW_ORDER_ADDRESS)
+        order.refresh_from_db()
+        self.assertEqual(order.delivery_address, NEW_ORDER_ADDRESS)
+        self.assertEqual(order.geocoded_delivery_address, new_geocoded_address)
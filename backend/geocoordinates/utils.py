@@ -1,8 +1,11 @@
+import time
+
 import requests
 from django.utils import timezone
 from django.conf import settings
 
 from geocoordinates.models import GeocodedAddress
+from star_burger.metrics import record_geocoder_call
 
 
 def get_or_create_geocoded_address(address_string: str) -> GeocodedAddress:
@@ -23,6 +26,36 @@ def get_or_create_geocoded_address(address_string: str) -> GeocodedAddress:
     return geocoded_obj
 
 
+def get_known_coordinates(addresses, geocoded_addresses=()):
+    """
+    Возвращает {адрес: (широта, долгота)} только по уже сохранённым геокодам,
+    без обращений к геокодеру. Недостающие адреса ищутся одним запросом.
+    """
+    coordinates = {
+        geocoded.address: (geocoded.latitude, geocoded.longitude)
+        for geocoded in geocoded_addresses
+        if geocoded and geocoded.latitude is not None and geocoded.longitude is not None
+    }
+    missing_addresses = set(filter(None, addresses)) - coordinates.keys()
+    if missing_addresses:
+        known_addresses = GeocodedAddress.objects.filter(
+            address__in=missing_addresses,
+            latitude__isnull=False,
+            longitude__isnull=False,
+        ).values_list('address', 'latitude', 'longitude')
+        for address, latitude, longitude in known_addresses:
+            coordinates[address] = (latitude, longitude)
+    return coordinates
+
+
+def request_geocoder(url, params):
+    started_at = time.monotonic()
+    try:
+        return requests.get(url, params=params)
+    finally:
+        record_geocoder_call(time.monotonic() - started_at)
+
+
 def fetch_coordinates(apikey, address):
     if not address:
         return None
@@ -39,7 +72,7 @@ def fetch_coordinates(apikey, address):
         'format': 'json',
     }
     try:
-        response = requests.get(base_url, params=params)
+        response = request_geocoder(base_url, params)
         response.raise_for_status()
         places_found = response.json().get('response', {}).get('GeoObjectCollection', {}).get('featureMember', [])
 
@@ -0,0 +1,39 @@
+import os
+
+workers = int(os.environ.get('GUNICORN_WORKERS', 3))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+LOCAL_CACHE_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def check_admission_limits(admission_control, threads):
+    """Очередь держит потоки: класс не должен занимать все потоки воркера."""
+    for name, route_class in admission_control.items():
+        occupied_threads = route_class['max_concurrent'] + route_class['max_queue']
+        if occupied_threads >= threads:
+            raise RuntimeError(
+                f'Класс {name} займёт {occupied_threads} потоков из {threads}: '
+                'уменьшите max_concurrent и max_queue или добавьте потоков в GUNICORN_THREADS'
+            )
+
+
+def on_starting(server):
+    """
+    Не даёт запустить воркеры, которые будут мешать друг другу: с кешем,
+    который у каждого процесса свой, или с очередями на все потоки.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'star_burger.settings')
+    from django.conf import settings
+
+    check_admission_limits(settings.ADMISSION_CONTROL, server.cfg.threads)
+
+    backend = settings.CACHES['default']['BACKEND']
+    if server.cfg.workers > 1 and backend in LOCAL_CACHE_BACKENDS:
+        raise RuntimeError(
+            f'{backend} не разделяется между {server.cfg.workers} воркерами: '
+            'версии и закешированные страницы разъедутся. '
+            'Укажите общий кеш в CACHE_URL, например redis://redis:6379/0'
+        )
@@ -15,6 +15,8 @@ urlpatterns = [
     # TODO заглушка для нереализованного функционала
     path('orders/', views.view_orders, name='view_orders'),
 
+    path('admission/', views.view_admission_stats, name='admission_stats'),
+
     path('login/', views.LoginView.as_view(), name='login'),
     path('logout/', views.LogoutView.as_view(), name='logout'),
 ]
@@ -1,14 +1,24 @@
+import os
+
 from django import forms
 from django.conf import settings
 from django.contrib.auth import authenticate, login
 from django.contrib.auth import views as auth_views
 from django.contrib.auth.decorators import user_passes_test
+from django.core.cache import cache
+from django.http import JsonResponse
 from django.shortcuts import redirect, render
+from django.template.loader import render_to_string
 from django.urls import reverse_lazy
 from django.views import View
 from geopy.distance import great_circle
+from foodcartapp.candidates import get_candidate_restaurants
 from foodcartapp.models import Order, Product, Restaurant
-from geocoordinates.utils import fetch_coordinates
+from foodcartapp.versions import get_order_version_name, get_versions
+from geocoordinates.utils import get_known_coordinates
+from star_burger.db_router import use_primary
+from star_burger.metrics import record_cache_lookup
+from star_burger.middleware import get_admission_stats
 
 
 class Login(forms.Form):
@@ -84,48 +94,107 @@ def view_products(request):
 
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
-def view_restaurants(request):
-    return render(request, template_name='restaurants_list.html', context={
-        'restaurants': Restaurant.objects.all(),
+def view_admission_stats(request):
+    """Счётчики живут в памяти процесса: ответ описывает только воркер с этим pid."""
+    return JsonResponse({
+        'pid': os.getpid(),
+        'gates': get_admission_stats(),
     })
 
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
-def view_orders(request):
-    orders = Order.objects.annotate_with_total_cost().prefetch_available_restaurants().filter(
-        status__in=[Order.STATUS_NEW, Order.STATUS_PREPARING]
-    ).order_by('created_at')
+def view_restaurants(request):
+    return render(request, template_name='restaurants_list.html', context={
+        'restaurants': Restaurant.objects.all(),
+    })
 
-    order_records = []
-    for order in orders:
 
-        assigned_restaurant_distance = None
-        if order.restaurant and order.delivery_address:
+def get_order_row_cache_key(order_id, order_version, menu_version, restaurants_version):
+    return f'order_row:{order_id}:{order_version}:{menu_version}:{restaurants_version}'
 
-            order_coords = fetch_coordinates(settings.YANDEX_GEOCODER_API_KEY, order.delivery_address)
-            restaurant_coords = fetch_coordinates(settings.YANDEX_GEOCODER_API_KEY, order.restaurant.address)
 
-            if order_coords and restaurant_coords:
-                order_lat, order_lon = float(order_coords[1]), float(order_coords[0])
-                restaurant_lon, restaurant_lat = float(restaurant_coords[0]), float(restaurant_coords[1])
-                distance = great_circle(
-                    (order_lat, order_lon),
-                    (restaurant_lat, restaurant_lon)
-                ).km
-                assigned_restaurant_distance = round(distance)
+def annotate_assigned_restaurant_distances(orders):
+    orders_with_restaurant = [order for order in orders if order.restaurant and order.delivery_address]
+    coordinates = get_known_coordinates(
+        addresses=[
+            address
+            for order in orders_with_restaurant
+            for address in (order.delivery_address, order.restaurant.address)
+        ],
+        geocoded_addresses=[
+            geocoded
+            for order in orders_with_restaurant
+            for geocoded in (order.geocoded_delivery_address, order.restaurant.geocoded_address)
+        ],
+    )
+    for order in orders:
+        order.assigned_restaurant_distance = None
+    for order in orders_with_restaurant:
+        order_coords = coordinates.get(order.delivery_address)
+        restaurant_coords = coordinates.get(order.restaurant.address)
+        if order_coords and restaurant_coords:
+            order.assigned_restaurant_distance = round(great_circle(order_coords, restaurant_coords).km)
 
-        order.assigned_restaurant_distance = assigned_restaurant_distance
 
-        order.suitable_restaurants = []
-        if order.status == Order.STATUS_NEW and not order.restaurant:
+def render_order_row(request, order):
+    return render_to_string('order_row.html', context={
+        'current_order_record': order,
+    }, request=request)
 
-            suitable_restaurants = Order.objects.get_matching_restaurants_for_order(order)
 
-            order.suitable_restaurants = suitable_restaurants
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_orders(request):
+    order_ids = list(
+        Order.objects.filter(
+            status__in=[Order.STATUS_NEW, Order.STATUS_PREPARING]
+        ).order_by('created_at').values_list('id', flat=True)
+    )
 
-        order_records.append(order)
+    versions = get_versions(
+        'menu',
+        'restaurants',
+        *[get_order_version_name(order_id) for order_id in order_ids],
+    )
+    row_cache_keys = {
+        order_id: get_order_row_cache_key(
+            order_id,
+            versions[get_order_version_name(order_id)],
+            versions['menu'],
+            versions['restaurants'],
+        )
+        for order_id in order_ids
+    }
+    order_rows = cache.get_many(row_cache_keys.values())
+    record_cache_lookup(len(row_cache_keys), len(order_rows))
+
+    changed_order_ids = [
+        order_id for order_id, cache_key in row_cache_keys.items()
+        if cache_key not in order_rows
+    ]
+    if changed_order_ids:
+        with use_primary():
+            changed_orders = list(
+                Order.objects.filter(id__in=changed_order_ids)
+                .select_related('restaurant__geocoded_address', 'geocoded_delivery_address')
+            )
+            annotate_assigned_restaurant_distances(changed_orders)
+            candidates = get_candidate_restaurants(request, [
+                order.id for order in changed_orders
+                if order.status == Order.STATUS_NEW and not order.restaurant
+            ])
+            for order in changed_orders:
+                order.suitable_restaurants = candidates.get(order.id, [])
+            rendered_rows = {
+                row_cache_keys[order.id]: render_order_row(request, order)
+                for order in changed_orders
+            }
+        cache.set_many(rendered_rows, timeout=settings.ORDER_ROW_CACHE_TIMEOUT)
+        order_rows.update(rendered_rows)
 
     context = {
-        'order_records': order_records,
+        'order_rows': [
+            order_rows[cache_key] for cache_key in row_cache_keys.values()
+            if cache_key in order_rows
+        ],
     }
     return render(request, template_name='order_items.html', context=context)
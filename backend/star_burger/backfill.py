@@ -0,0 +1,44 @@
+import time
+
+from django.db import transaction
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill(queryset, update_batch, fields, batch_size=BACKFILL_BATCH_SIZE,
+             throttle=0, start_after=None, progress=None):
+    """
+    Обновляет строки queryset пачками по возрастанию первичного ключа.
+
+    update_batch получает список объектов пачки и возвращает те, что нужно
+    сохранить; они записываются одним bulk_update по полям fields. Каждая пачка
+    коммитится отдельно, поэтому в миграции с atomic = False блокировки держатся
+    только на время одной пачки. Между пачками выдерживается пауза throttle секунд.
+
+    progress(last_pk, processed, updated) вызывается после каждой пачки.
+    Прерванный проход можно продолжить, передав последний last_pk в start_after.
+    Возвращает количество обновлённых строк.
+    """
+    model = queryset.model
+    queryset = queryset.order_by('pk')
+    last_pk = start_after
+    processed_count = 0
+    updated_count = 0
+    while True:
+        batch_queryset = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        batch = list(batch_queryset[:batch_size])
+        if not batch:
+            return updated_count
+
+        with transaction.atomic(using=queryset.db):
+            changed_objects = update_batch(batch)
+            if changed_objects:
+                model._base_manager.using(queryset.db).bulk_update(changed_objects, fields)
+
+        last_pk = batch[-1].pk
+        processed_count += len(batch)
+        updated_count += len(changed_objects or [])
+        if progress:
+            progress(last_pk, processed_count, updated_count)
+        if throttle:
+            time.sleep(throttle)
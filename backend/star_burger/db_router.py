@@ -0,0 +1,55 @@
+import contextvars
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+PRIMARY_ONLY_APPS = {'auth', 'sessions'}
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+
+
+def has_replica():
+    return settings.REPLICA_DATABASE in connections.databases
+
+
+def start_replica_reads():
+    return _replica_reads.set(has_replica())
+
+
+def finish_replica_reads(token):
+    _replica_reads.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """
+    Читать из основной базы внутри блока. Нужно там, где результат кладётся
+    в кеш под новой версией: отстающая реплика закешировала бы устаревшие данные.
+    """
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Отправляет чтения на реплику, если их разрешил ReadReplicaMiddleware.
+    Запись, сессии и пользователи всегда идут в default.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            return settings.REPLICA_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
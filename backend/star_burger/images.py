@@ -0,0 +1,37 @@
+import io
+
+from PIL import Image, ImageOps
+
+VARIANT_FORMATS = {
+    'jpeg': {'format': 'JPEG', 'extension': 'jpg', 'options': {'quality': 82, 'optimize': True, 'progressive': True}},
+    'webp': {'format': 'WEBP', 'extension': 'webp', 'options': {'quality': 80, 'method': 6}},
+}
+
+
+def render_variants(source, widths):
+    """
+    Уменьшает картинку до каждой ширины из widths и кодирует в JPEG и WebP.
+    Возвращает список (формат, ширина, байты). Картинки не увеличиваются:
+    если исходник уже всех ширин, остаётся один вариант исходного размера.
+
+    Функция не трогает Django, чтобы её можно было запускать в отдельном процессе.
+    """
+    with Image.open(io.BytesIO(source)) as image:
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        target_widths = sorted({width for width in widths if width < image.width}) or [image.width]
+        variants = []
+        for width in target_widths:
+            height = max(round(image.height * width / image.width), 1)
+            resized = image.resize((width, height), Image.LANCZOS)
+            for variant_format, params in VARIANT_FORMATS.items():
+                frame = resized
+                if params['format'] == 'JPEG' and has_alpha:
+                    frame = Image.new('RGB', resized.size, 'white')
+                    frame.paste(resized, mask=resized.getchannel('A'))
+                output = io.BytesIO()
+                frame.save(output, params['format'], **params['options'])
+                variants.append((variant_format, width, output.getvalue()))
+        return variants
@@ -0,0 +1,65 @@
+from contextvars import ContextVar
+
+
+class RequestMetrics:
+    """
+    Счётчики одного запроса. SQL-запросы считаются для всех соединений,
+    а попадания и промахи кеша — только там, где код сам вызывает
+    record_cache_lookup: версии, строки заказов, кандидаты и payload'ы.
+    Остальные обращения к кешу (сессии, блокировки) в метрики не попадают.
+    """
+
+    def __init__(self):
+        self.query_count = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.geocoder_calls = 0
+        self.geocoder_time = 0.0
+
+    def as_dict(self):
+        return {
+            'queries': self.query_count,
+            'db_ms': round(self.db_time * 1000, 1),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'geocoder_calls': self.geocoder_calls,
+            'geocoder_ms': round(self.geocoder_time * 1000, 1),
+        }
+
+
+_current_metrics = ContextVar('request_metrics', default=None)
+
+
+def start_request_metrics():
+    metrics = RequestMetrics()
+    return metrics, _current_metrics.set(metrics)
+
+
+def finish_request_metrics(token):
+    _current_metrics.reset(token)
+
+
+def get_request_metrics():
+    return _current_metrics.get()
+
+
+def record_query(duration):
+    metrics = get_request_metrics()
+    if metrics:
+        metrics.query_count += 1
+        metrics.db_time += duration
+
+
+def record_cache_lookup(requested, found):
+    metrics = get_request_metrics()
+    if metrics:
+        metrics.cache_hits += found
+        metrics.cache_misses += requested - found
+
+
+def record_geocoder_call(duration):
+    metrics = get_request_metrics()
+    if metrics:
+        metrics.geocoder_calls += 1
+        metrics.geocoder_time += duration
@@ -0,0 +1,286 @@
+import json
+import logging
+import threading
+import time
+from contextlib import ExitStack
+from functools import partial
+
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+
+from .db_router import (finish_replica_reads, has_replica,
+                        start_replica_reads)
+from .metrics import (finish_request_metrics, record_query,
+                      start_request_metrics)
+
+logger = logging.getLogger('star_burger.performance')
+
+
+def get_view_name(request):
+    resolver_match = getattr(request, 'resolver_match', None)
+    if not resolver_match:
+        return None
+    view = getattr(resolver_match.func, 'view_class', resolver_match.func)
+    return view.__name__
+
+
+class StreamingContentCloser:
+    """
+    Обёртка над телом потокового ответа: on_close вызывается, когда сервер
+    закрывает ответ — дочитав тело, оборвав его или не начав читать вовсе.
+    """
+
+    def __init__(self, content, on_close):
+        self.content = iter(content)
+        self.on_close = on_close
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.content)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.on_close()
+
+
+def call_on_response_close(response, callback):
+    """У обычного ответа callback вызывается сразу, у потокового — после отдачи тела."""
+    if response.streaming:
+        response.streaming_content = StreamingContentCloser(response.streaming_content, callback)
+    else:
+        callback()
+
+
+def measure_query(execute, sql, params, many, context):
+    started_at = time.monotonic()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record_query(time.monotonic() - started_at)
+
+
+class RequestMetricsMiddleware:
+    """Считает SQL-запросы, обращения к кешу и геокодеру для каждого запроса."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics, token = start_request_metrics()
+        started_at = time.monotonic()
+        query_wrappers = ExitStack()
+        try:
+            for connection in connections.all():
+                query_wrappers.enter_context(connection.execute_wrapper(measure_query))
+            response = self.get_response(request)
+        except Exception:
+            query_wrappers.close()
+            finish_request_metrics(token)
+            raise
+
+        def finish():
+            query_wrappers.close()
+            finish_request_metrics(token)
+            self.report(request, response, metrics, time.monotonic() - started_at)
+
+        # Тело потокового ответа выполняет запросы уже после выхода из middleware,
+        # поэтому счётчики закрываются только когда сервер дочитает ответ.
+        call_on_response_close(response, finish)
+        return response
+
+    def report(self, request, response, metrics, total_time):
+        view_name = get_view_name(request)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': view_name,
+            'status': response.status_code,
+            'total_ms': round(total_time * 1000, 1),
+            **metrics.as_dict(),
+        }
+        logger.info('request metrics %s', json.dumps(record), extra={'metrics': record})
+
+        budget = settings.VIEW_BUDGETS.get(view_name, {})
+        exceeded = {
+            name: record[name]
+            for name, limit in budget.items()
+            if record.get(name, 0) > limit
+        }
+        if exceeded:
+            logger.warning(
+                'view %s exceeded budget %s: %s',
+                view_name,
+                json.dumps(budget),
+                json.dumps(exceeded),
+                extra={'metrics': record},
+            )
+
+        if settings.SERVER_TIMING_HEADER and not response.streaming:
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={record["db_ms"]};desc="{record["queries"]} queries"',
+                f'cache;desc="hits={record["cache_hits"]} misses={record["cache_misses"]}"',
+                f'geocoder;dur={record["geocoder_ms"]};desc="{record["geocoder_calls"]} calls"',
+                f'total;dur={record["total_ms"]}',
+            ])
+
+
+class AdmissionGate:
+    """Ограничивает число одновременных запросов одного класса в процессе."""
+
+    def __init__(self, name, max_concurrent, max_queue, queue_timeout):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted_count = 0
+        self.rejected_count = 0
+
+    def has_free_slot(self):
+        return self.in_flight < self.max_concurrent
+
+    def acquire(self):
+        with self.condition:
+            if not self.has_free_slot():
+                if self.waiting >= self.max_queue:
+                    self.rejected_count += 1
+                    return False
+
+                self.waiting += 1
+                try:
+                    admitted = self.condition.wait_for(self.has_free_slot, timeout=self.queue_timeout)
+                finally:
+                    self.waiting -= 1
+                if not admitted:
+                    self.rejected_count += 1
+                    return False
+
+            self.in_flight += 1
+            self.admitted_count += 1
+            return True
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+
+    def get_stats(self):
+        return {
+            'in_flight': self.in_flight,
+            'queue_depth': self.waiting,
+            'max_concurrent': self.max_concurrent,
+            'max_queue': self.max_queue,
+            'admitted': self.admitted_count,
+            'rejected': self.rejected_count,
+        }
+
+
+admission_gates = {}
+admission_gates_lock = threading.Lock()
+
+
+def get_admission_gate(path):
+    for name, route_class in settings.ADMISSION_CONTROL.items():
+        if path.startswith(tuple(route_class['prefixes'])):
+            break
+    else:
+        return None
+
+    with admission_gates_lock:
+        if name not in admission_gates:
+            admission_gates[name] = AdmissionGate(
+                name,
+                max_concurrent=route_class['max_concurrent'],
+                max_queue=route_class['max_queue'],
+                queue_timeout=route_class['queue_timeout'],
+            )
+        return admission_gates[name]
+
+
+def get_admission_stats():
+    return {name: gate.get_stats() for name, gate in admission_gates.items()}
+
+
+class AdmissionControlMiddleware:
+    """
+    Не даёт медленным запросам одного класса (например, заказам, которые
+    ждут геокодер) занять все потоки воркера. Лишние запросы ждут в
+    ограниченной очереди, а при её переполнении сразу получают 503.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        gate = get_admission_gate(request.path)
+        if not gate:
+            return self.get_response(request)
+
+        if not gate.acquire():
+            response = JsonResponse(
+                {'detail': 'Сервис перегружен, попробуйте позже'},
+                status=503,
+            )
+            response['Retry-After'] = settings.ADMISSION_RETRY_AFTER
+            return response
+
+        try:
+            response = self.get_response(request)
+        except Exception:
+            gate.release()
+            raise
+
+        call_on_response_close(response, gate.release)
+        return response
+
+
+class ReadReplicaMiddleware:
+    """
+    Отправляет чтения из представлений REPLICA_READ_VIEWS на реплику. После
+    изменяющего запроса клиент получает cookie и какое-то время читает из
+    основной базы, чтобы видеть свои же изменения, пока реплика догоняет.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.replica_reads_token = None
+        try:
+            response = self.get_response(request)
+        except Exception:
+            self.finish(request)
+            raise
+
+        if has_replica() and request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE,
+                '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+
+        call_on_response_close(response, partial(self.finish, request))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.COOKIES.get(settings.REPLICA_STICKY_COOKIE):
+            return None
+        view = getattr(view_func, 'view_class', view_func)
+        if view.__name__ in settings.REPLICA_READ_VIEWS:
+            request.replica_reads_token = start_replica_reads()
+        return None
+
+    def finish(self, request):
+        if request.replica_reads_token:
+            finish_replica_reads(request.replica_reads_token)
+            request.replica_reads_token = None
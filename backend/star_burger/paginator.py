@@ -0,0 +1,31 @@
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор для больших таблиц в админке: если планировщик PostgreSQL
+    оценивает выборку больше чем в ADMIN_ESTIMATED_COUNT_THRESHOLD строк,
+    вместо точного COUNT(*) используется эта оценка.
+    """
+
+    def get_estimated_count(self):
+        queryset = self.object_list
+        if not hasattr(queryset, 'explain'):
+            return None
+        if connections[queryset.db].vendor != 'postgresql':
+            return None
+
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    @cached_property
+    def count(self):
+        estimated_count = self.get_estimated_count()
+        if estimated_count is not None and estimated_count >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+            return estimated_count
+        return super().count
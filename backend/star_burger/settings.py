@@ -41,6 +41,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'rollbar.contrib.django.middleware.RollbarNotifierMiddleware',
+    'star_burger.middleware.RequestMetricsMiddleware',
+    'star_burger.middleware.AdmissionControlMiddleware',
+    'star_burger.middleware.ReadReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -91,12 +94,83 @@ WSGI_APPLICATION = 'star_burger.wsgi.application'
 MEDIA_ROOT = os.path.join(os.path.dirname(BASE_DIR), 'media')
 MEDIA_URL = '/media/'
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'star_burger.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+PRODUCT_IMAGE_WIDTHS = env.list('PRODUCT_IMAGE_WIDTHS', subcast=int, default=[160, 320, 640])
+
+IMAGE_VARIANT_WORKERS = env.int('IMAGE_VARIANT_WORKERS', default=2)
+
 DATABASES = {
     'default': dj_database_url.config(
         default=env('DB_URL')
     )
 }
 
+REPLICA_DATABASE = 'replica'
+
+if env('REPLICA_DB_URL', default=None):
+    DATABASES[REPLICA_DATABASE] = {
+        **dj_database_url.parse(env('REPLICA_DB_URL')),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['star_burger.db_router.ReplicaRouter']
+
+REPLICA_READ_VIEWS = env.list('REPLICA_READ_VIEWS', default=[
+    'start_page',
+    'product_list_api',
+    'banners_list_api',
+    'bootstrap_api',
+    'view_products',
+    'view_restaurants',
+    'view_orders',
+])
+
+REPLICA_STICKY_COOKIE = 'read_primary'
+
+REPLICA_STICKY_SECONDS = env.int('REPLICA_STICKY_SECONDS', default=10)
+
+# Версии, закешированные строки заказов и payload'ы должны быть общими для всех
+# воркеров gunicorn, поэтому в проде нужен Redis: CACHE_URL=redis://host:6379/0.
+# locmem годится только для runserver и одного процесса, см. gunicorn.conf.py.
+CACHES = {
+    'default': env.dj_cache_url('CACHE_URL', default='locmem://?max_entries=10000'),
+}
+
+ORDER_ROW_CACHE_TIMEOUT = env.int('ORDER_ROW_CACHE_TIMEOUT', default=60 * 60)
+
+CANDIDATE_RESTAURANTS_CACHE_TIMEOUT = env.int('CANDIDATE_RESTAURANTS_CACHE_TIMEOUT', default=60 * 60)
+
+# Дольше, чем живут строки и кандидаты, закешированные под версией заказа,
+# иначе они пропадали бы раньше своего таймаута.
+ORDER_VERSION_CACHE_TIMEOUT = env.int(
+    'ORDER_VERSION_CACHE_TIMEOUT',
+    default=2 * max(ORDER_ROW_CACHE_TIMEOUT, CANDIDATE_RESTAURANTS_CACHE_TIMEOUT),
+)
+
+PAYLOAD_CACHE_TIMEOUT = env.int('PAYLOAD_CACHE_TIMEOUT', default=24 * 60 * 60)
+
+PAYLOAD_LOCK_TIMEOUT = env.int('PAYLOAD_LOCK_TIMEOUT', default=10)
+
+IDEMPOTENCY_KEY_TTL = env.int('IDEMPOTENCY_KEY_TTL', default=24 * 60 * 60)
+
+ORDER_ARCHIVE_AFTER_DAYS = env.int('ORDER_ARCHIVE_AFTER_DAYS', default=90)
+
+PARTNER_API_TOKENS = env.list('PARTNER_API_TOKENS', default=[])
+
+BULK_ORDERS_BATCH_SIZE = env.int('BULK_ORDERS_BATCH_SIZE', default=500)
+
+PRODUCTS_PAGE_MAX_LIMIT = env.int('PRODUCTS_PAGE_MAX_LIMIT', default=100)
+
+PRODUCTS_STREAM_CHUNK_SIZE = env.int('PRODUCTS_STREAM_CHUNK_SIZE', default=200)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -145,3 +219,61 @@ ROLLBAR = {
     'root': BASE_DIR,
 }
 
+
+SERVER_TIMING_HEADER = env.bool('SERVER_TIMING_HEADER', default=True)
+
+VIEW_BUDGETS = {
+    'view_orders': {'queries': 20, 'db_ms': 200, 'geocoder_calls': 0},
+    'view_products': {'queries': 5, 'db_ms': 100},
+    'product_list_api': {'queries': 3, 'db_ms': 50},
+    'banners_list_api': {'queries': 2},
+    'register_order': {'queries': 15, 'db_ms': 200},
+}
+
+ADMIN_ESTIMATED_COUNT_THRESHOLD = env.int('ADMIN_ESTIMATED_COUNT_THRESHOLD', default=100_000)
+
+# Должно совпадать с числом потоков воркера, его же читает gunicorn.conf.py.
+GUNICORN_THREADS = env.int('GUNICORN_THREADS', default=8)
+
+# Ожидающий в очереди запрос тоже занимает поток воркера, поэтому у каждого
+# класса max_concurrent + max_queue меньше числа потоков: остальным страницам
+# всегда остаётся поток. gunicorn.conf.py не запустится, если это не так.
+ADMISSION_CONTROL = {
+    'orders': {
+        'prefixes': ['/api/order/', '/api/orders/'],
+        'max_concurrent': env.int('ADMISSION_ORDERS_CONCURRENCY', default=max(1, GUNICORN_THREADS // 4)),
+        'max_queue': env.int('ADMISSION_ORDERS_QUEUE', default=min(1, GUNICORN_THREADS // 8)),
+        'queue_timeout': 5,
+    },
+    'catalog': {
+        'prefixes': ['/api/products/', '/api/banners/', '/api/bootstrap/'],
+        'max_concurrent': env.int('ADMISSION_CATALOG_CONCURRENCY', default=max(1, GUNICORN_THREADS // 2)),
+        'max_queue': env.int('ADMISSION_CATALOG_QUEUE', default=GUNICORN_THREADS // 4),
+        'queue_timeout': 2,
+    },
+    'manager': {
+        'prefixes': ['/manager/', '/admin/'],
+        'max_concurrent': env.int('ADMISSION_MANAGER_CONCURRENCY', default=max(1, GUNICORN_THREADS // 4)),
+        'max_queue': env.int('ADMISSION_MANAGER_QUEUE', default=GUNICORN_THREADS // 4),
+        'queue_timeout': 10,
+    },
+}
+
+ADMISSION_RETRY_AFTER = env.int('ADMISSION_RETRY_AFTER', default=5)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'star_burger.performance': {
+            'handlers': ['console'],
+            'level': env.str('PERFORMANCE_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,29 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Называет файлы по sha256 содержимого. Одинаковые загрузки хранятся один раз,
+    а изменённый файл получает новый адрес, поэтому /media/ можно кэшировать навсегда.
+    """
+
+    def get_content_name(self, name, content):
+        directory, filename = os.path.split(name)
+        _, extension = os.path.splitext(filename)
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        return os.path.join(directory, f'{digest.hexdigest()}{extension.lower()}')
+
+    def is_content_name(self, name):
+        stem, _ = os.path.splitext(os.path.basename(name))
+        return len(stem) == 64 and all(char in '0123456789abcdef' for char in stem)
+
+    def _save(self, name, content):
+        name = self.get_content_name(name, content)
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
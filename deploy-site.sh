@@ -2,8 +2,8 @@
 set -e
 
 echo "1. Очистка"
-docker stop nginx backend db 2>/dev/null || true
-docker rm nginx backend db 2>/dev/null || true
+docker stop nginx backend db starburger_redis 2>/dev/null || true
+docker rm nginx backend db starburger_redis 2>/dev/null || true
 docker volume prune -f
 
 echo "2. git pull"
@@ -12,8 +12,8 @@ git pull
 echo "3. Сборка"
 docker compose -f docker-compose.prod.yaml build
 
-echo "4. Запуск БД и backend"
-docker compose -f docker-compose.prod.yaml up -d db backend
+echo "4. Запуск БД, кеша и backend"
+docker compose -f docker-compose.prod.yaml up -d db redis backend
 
 echo "5. Миграции + collectstatic"
 docker compose -f docker-compose.prod.yaml exec backend \
@@ -101,26 +101,21 @@ class App extends Component {
   }
 
 
-  async getProducts(){
-    let response = await fetch('/api/products/', {
-      headers: {
-        'Accept': 'application/json',
-        'Content-Type': 'application/json',
-      }
+  applyBootstrap(data){
+    this.setState({
+      banners: data.banners,
+      products: data.products,
     });
+  }
 
-    if (!response.ok){
+  async getBootstrap(){
+    let inlineData = document.getElementById('bootstrap-data');
+    if (inlineData && inlineData.textContent.trim()){
+      this.applyBootstrap(JSON.parse(inlineData.textContent));
       return;
     }
 
-    let data = await response.json();
-    this.setState({
-      products : data
-    });
-  }
-
-  async getBanners(){
-    let response = await fetch('/api/banners/', {
+    let response = await fetch('/api/bootstrap/', {
       headers: {
         'Accept': 'application/json',
         'Content-Type': 'application/json',
@@ -132,14 +127,11 @@ class App extends Component {
     }
 
     let data = await response.json();
-    this.setState({
-      banners : data
-    });
+    this.applyBootstrap(data);
   }
 
   componentDidMount(){
-    this.getProducts();
-    this.getBanners();
+    this.getBootstrap();
   }
 
 
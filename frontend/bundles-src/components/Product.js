@@ -39,13 +39,17 @@ class Product extends Component{
 
   render(){
     let image = this.props.product.image;
+    let srcset = this.props.product.image_srcset || {};
     let name = this.props.product.name;
     let price = this.props.product.price;
     let id = this.props.product.id;
     return (
       <div className="product">
         <div className="product-image">
-          <img src={image} alt={name} onClick={this.quickView.bind(this)}/>
+          <picture>
+            {srcset.webp && <source type="image/webp" srcSet={srcset.webp} sizes="(max-width: 600px) 50vw, 320px"/>}
+            <img src={image} srcSet={srcset.jpeg} sizes="(max-width: 600px) 50vw, 320px" alt={name} onClick={this.quickView.bind(this)}/>
+          </picture>
         </div>
         <h4 className="product-name">{name}</h4>
         <p className="product-price currency">{price}</p>